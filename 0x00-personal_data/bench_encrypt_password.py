@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Benchmark of hash_passwords/verify_many throughput against the number of
+worker processes
+
+Usage: ./bench_encrypt_password.py [number_of_passwords] [rounds]
+"""
+import os
+import sys
+import time
+
+hash_passwords = __import__('encrypt_password').hash_passwords
+verify_many = __import__('encrypt_password').verify_many
+
+
+def worker_counts():
+    """ 1, 2, 4, ... up to the number of cores """
+    cores = os.cpu_count() or 1
+    count = 1
+    while count < cores:
+        yield count
+        count *= 2
+    yield cores
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    passwords = ["password-{}".format(i) for i in range(count)]
+    print("{} passwords, cost factor {}".format(count, rounds))
+    print("{:>7} {:>14} {:>14}".format("workers", "hash/s", "verify/s"))
+    for workers in worker_counts():
+        start = time.perf_counter()
+        hashes = list(hash_passwords(passwords, rounds=rounds,
+                                     workers=workers))
+        hashed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = list(verify_many(zip(hashes, passwords), workers=workers))
+        verified = time.perf_counter() - start
+        assert all(results)
+
+        print("{:>7} {:>14.1f} {:>14.1f}".format(
+            workers, count / hashed, count / verified))
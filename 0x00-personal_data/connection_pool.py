@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Module for pooling database connections
+"""
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """ Raised when no connection could be checked out in time """
+
+
+class PooledConnection:
+    """
+    Proxy of a pooled connection: close() returns it to its pool
+    """
+
+    def __init__(self, pool: 'ConnectionPool', raw: Any):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)
+
+    def __enter__(self) -> 'PooledConnection':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Returns the connection to the pool instead of closing it
+        """
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections
+
+    Args:
+        connect (Callable): Opens a new driver connection.
+        min_size (int): Connections opened up front and kept when idle.
+        max_size (int): Maximum number of open connections.
+        idle_timeout (float): Seconds after which an idle connection
+            above min_size is closed.
+        checkout_timeout (float): Seconds to wait for a free connection
+            before raising PoolTimeout.
+    """
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1,
+                 max_size: int = 5, idle_timeout: float = 300.0,
+                 checkout_timeout: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: {}-{}".format(min_size,
+                                                              max_size))
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        for _ in range(min_size):
+            self._idle.append((self.connect(), time.monotonic()))
+            self._size += 1
+
+    def acquire(self) -> PooledConnection:
+        """
+        Checks out a healthy connection, waiting for one if the pool is full
+        """
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                self._close_expired()
+                if self._idle:
+                    raw, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    raw = None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._record_wait(time.monotonic() - start)
+                    raise PoolTimeout("No connection available after "
+                                      "{}s".format(self.checkout_timeout))
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                self._record_wait(time.monotonic() - start)
+            self._checkouts += 1
+
+        if raw is not None and not self._is_healthy(raw):
+            self._discard(raw)
+            raw = None
+        if raw is None:
+            try:
+                raw = self.connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        return PooledConnection(self, raw)
+
+    def release(self, raw: Any):
+        """
+        Puts a checked out connection back in the pool
+
+        The connection is reset first, so the next caller doesn't inherit
+        an open transaction or unread results; one that can't be reset is
+        closed and its slot freed.
+        """
+        reset = self._reset(raw)
+        with self._cond:
+            if self._closed or not reset:
+                self._size -= 1
+                self._close_raw(raw)
+                self._cond.notify()
+                return
+            self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        """
+        Context manager checking out a connection and returning it
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        """
+        Closes every idle connection; busy ones are closed when released
+        """
+        with self._cond:
+            self._closed = True
+            for raw, _ in self._idle:
+                self._close_raw(raw)
+            self._size -= len(self._idle)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Returns the pool size and the checkout wait-time metrics
+        """
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total": self._wait_time,
+                "wait_time_max": self._max_wait_time,
+            }
+
+    def _record_wait(self, wait_time: float):
+        """ Accounts for a checkout that had to wait """
+        self._waits += 1
+        self._wait_time += wait_time
+        self._max_wait_time = max(self._max_wait_time, wait_time)
+
+    def _close_expired(self):
+        """ Closes idle connections above min_size past idle_timeout """
+        now = time.monotonic()
+        while len(self._idle) > self.min_size:
+            raw, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.pop(0)
+            self._size -= 1
+            self._close_raw(raw)
+
+    def _discard(self, raw: Any):
+        """ Closes a broken connection, its slot is reused by the caller """
+        self._close_raw(raw)
+
+    @staticmethod
+    def _is_healthy(raw: Any) -> bool:
+        """ Checks a connection before handing it out """
+        try:
+            if hasattr(raw, "is_connected"):
+                return raw.is_connected()
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(raw: Any) -> bool:
+        """ Consumes unread results and rolls back the open transaction """
+        try:
+            if hasattr(raw, "consume_results"):
+                raw.consume_results()
+            raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_raw(raw: Any):
+        """ Closes a driver connection, ignoring errors """
+        try:
+            raw.close()
+        except Exception:
+            pass
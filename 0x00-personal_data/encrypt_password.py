@@ -4,18 +4,27 @@ Module for password encryption and validation
 """
 
 import bcrypt
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Tuple
 
-def hash_password(password: str) -> bytes:
+def hash_password(password: str, rounds: int = None) -> bytes:
     """
     Hash a password using bcrypt.
 
     Args:
         password (str): The password to hash.
+        rounds (int): The bcrypt cost factor, bcrypt's default if None.
 
     Returns:
         bytes: The salted, hashed password.
     """
-    salt = bcrypt.gensalt()
+    if rounds is None:
+        salt = bcrypt.gensalt()
+    else:
+        salt = bcrypt.gensalt(rounds)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed
 
@@ -32,3 +41,128 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     """
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
 
+def get_rounds(hashed_password: bytes) -> int:
+    """
+    Read the cost factor of a bcrypt hash.
+
+    Args:
+        hashed_password (bytes): The hashed password ($2b$<cost>$...).
+
+    Returns:
+        int: The cost factor, or None if the hash can't be parsed.
+    """
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode('utf-8')
+    parts = hashed_password.split(b'$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def calibrate_rounds(budget_ms: float, min_rounds: int = 4,
+                     max_rounds: int = 16) -> int:
+    """
+    Find the highest cost factor hashing within a latency budget on this host.
+
+    Each extra round doubles the hashing time, so hashing stops as soon as
+    one cost factor exceeds the budget.
+
+    Args:
+        budget_ms (float): The hashing time budget in milliseconds.
+        min_rounds (int): The lowest acceptable cost factor.
+        max_rounds (int): The highest cost factor to try.
+
+    Returns:
+        int: The calibrated cost factor, at least min_rounds.
+    """
+    best = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        start = time.perf_counter()
+        hash_password("calibration", rounds)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > budget_ms:
+            break
+        best = rounds
+    return best
+
+def verify_and_update(hashed_password: bytes, password: str,
+                      rounds: int) -> Tuple[bool, bytes]:
+    """
+    Validate a password and rehash it when its cost factor is not `rounds`.
+
+    Args:
+        hashed_password (bytes): The stored hashed password.
+        password (str): The password to validate.
+        rounds (int): The target cost factor.
+
+    Returns:
+        Tuple[bool, bytes]: Whether the password is valid, and the new hash
+        to store, or None when the stored hash can be kept.
+    """
+    if not is_valid(hashed_password, password):
+        return False, None
+    if get_rounds(hashed_password) == rounds:
+        return True, None
+    return True, hash_password(password, rounds)
+
+def _hash_task(task: Tuple[str, int]) -> bytes:
+    """
+    Worker entry point of hash_passwords.
+    """
+    return hash_password(*task)
+
+def _verify_task(pair: Tuple[bytes, str]) -> bool:
+    """
+    Worker entry point of verify_many.
+    """
+    return is_valid(*pair)
+
+def _ordered_map(func: Callable, items: Iterable, workers: int = None,
+                 window: int = None) -> Iterator:
+    """
+    Apply func to items in a process pool and yield results in input order.
+
+    At most `window` items are in flight, so arbitrarily long iterables are
+    consumed lazily and memory stays bounded.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if window is None:
+        window = 4 * workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def hash_passwords(passwords: Iterable[str], rounds: int = None,
+                   workers: int = None) -> Iterator[bytes]:
+    """
+    Hash many passwords across a process pool.
+
+    Args:
+        passwords (Iterable[str]): The passwords to hash.
+        rounds (int): The bcrypt cost factor, bcrypt's default if None.
+        workers (int): Number of worker processes, one per core if None.
+
+    Returns:
+        Iterator[bytes]: The hashed passwords, in the order of the input.
+    """
+    tasks = ((password, rounds) for password in passwords)
+    return _ordered_map(_hash_task, tasks, workers)
+
+def verify_many(pairs: Iterable[Tuple[bytes, str]],
+                workers: int = None) -> Iterator[bool]:
+    """
+    Validate many (hashed_password, password) pairs across a process pool.
+
+    Args:
+        pairs (Iterable[Tuple[bytes, str]]): The pairs to validate.
+        workers (int): Number of worker processes, one per core if None.
+
+    Returns:
+        Iterator[bool]: One result per pair, in the order of the input.
+    """
+    return _ordered_map(_verify_task, pairs, workers)
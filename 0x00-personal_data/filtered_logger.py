@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
+import atexit
+import copy
 import os
+import re
+import threading
 import mysql.connector
 from mysql.connector import connection
 import logging
-from typing import List
+import logging.handlers
+import sqlite3
+from functools import lru_cache
+from queue import Empty, Full, Queue
+from connection_pool import ConnectionPool
+from typing import Callable, Iterator, List, Match, Pattern, Tuple
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
 
+_pool = None
+_pool_lock = threading.Lock()
+
 
 class RedactingFormatter(logging.Formatter):
     """ Redacting Formatter class
@@ -19,40 +31,236 @@ class RedactingFormatter(logging.Formatter):
     def __init__(self, fields: List[str]):
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.pattern = redaction_pattern(tuple(fields), self.SEPARATOR)
+        self.replacement = redaction_replacement(self.REDACTION)
 
     def format(self, record: logging.LogRecord) -> str:
-        record.msg = filter_datum(self.fields, self.REDACTION, record.msg, self.SEPARATOR)
+        if self.pattern is not None:
+            record.msg = self.pattern.sub(self.replacement, record.msg)
         return super(RedactingFormatter, self).format(record)
 
 
+@lru_cache(maxsize=128)
+def redaction_pattern(fields: Tuple[str, ...], separator: str) -> Pattern:
+    """ Returns the compiled pattern matching every field in one pass """
+    if len(fields) == 0:
+        return None
+    # Longest names first so a field never shadows another one
+    names = sorted(set(fields), key=len, reverse=True)
+    alternation = '|'.join(re.escape(name) for name in names)
+    return re.compile(r'({})=[^{}]*'.format(alternation, re.escape(separator)))
+
+
+def redaction_replacement(redaction: str) -> Callable[[Match], str]:
+    """ Returns the substitution function keeping the field name """
+    suffix = '=' + redaction
+    return lambda match: match.group(1) + suffix
+
+
 def filter_datum(fields: List[str], redaction: str, message: str, separator: str) -> str:
     """ Returns the log message obfuscated """
-    for field in fields:
-        message = re.sub(rf'{field}=[^{separator}]*', f'{field}={redaction}', message)
-    return message
+    pattern = redaction_pattern(tuple(fields), separator)
+    if pattern is None:
+        return message
+    return pattern.sub(redaction_replacement(redaction), message)
+
+
+class RedactingQueueHandler(logging.handlers.QueueHandler):
+    """ Queue handler only enqueuing records, redaction happens later
+
+    When the bounded queue is full the overflow policy applies: "block"
+    waits for room, "drop" discards the record and "sample" retries one
+    record out of sample_rate and discards the others. Only "block" ever
+    waits: a sampled record which still doesn't fit is dropped too.
+    """
+
+    OVERFLOW_POLICIES = ("block", "drop", "sample")
+
+    def __init__(self, queue: Queue, overflow: str = "block",
+                 sample_rate: int = 10):
+        super(RedactingQueueHandler, self).__init__(queue)
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: {}".format(overflow))
+        self.overflow = overflow
+        self.sample_rate = max(1, sample_rate)
+        self.dropped = 0
+        self._overflowed = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """ Merges the message arguments without formatting the record """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        """ Puts a record in the queue according to the overflow policy """
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except Full:
+            pass
+        if self.overflow == "sample":
+            self._overflowed += 1
+            if self._overflowed % self.sample_rate == 0:
+                try:
+                    self.queue.put_nowait(record)
+                    return
+                except Full:
+                    pass
+        self.dropped += 1
+
+
+class RedactingQueueListener(object):
+    """ Background thread formatting and writing queued records in batches
+    """
+
+    def __init__(self, queue: Queue, handler: logging.StreamHandler,
+                 batch_size: int = 100):
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self._thread = None
+
+    def start(self):
+        """ Starts the listener thread """
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="user_data-log-listener")
+        self._thread.start()
+
+    def flush(self):
+        """ Waits until every queued record has been written """
+        self.queue.join()
+
+    def stop(self):
+        """ Writes the remaining records and stops the listener thread """
+        if self._thread is None:
+            return
+        self.queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """ Dequeues records and writes them one batch at a time """
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            lines = []
+            last = None
+            for record in batch:
+                if record is None:
+                    running = False
+                    continue
+                try:
+                    lines.append(self.handler.format(record))
+                    last = record
+                except Exception:
+                    self.handler.handleError(record)
+            if lines:
+                self._write(lines, last)
+            for _ in batch:
+                self.queue.task_done()
+
+    def _write(self, lines: List[str], last: logging.LogRecord):
+        """ Writes formatted records with a single write and flush
+
+        A failed write is reported by the handler (handleError) with the
+        last record of the batch.
+        """
+        terminator = self.handler.terminator
+        self.handler.acquire()
+        try:
+            stream = self.handler.stream
+            stream.write(terminator.join(lines) + terminator)
+            stream.flush()
+        except Exception:
+            self.handler.handleError(last)
+        finally:
+            self.handler.release()
 
 
 def get_logger() -> logging.Logger:
-    """ Returns a logging.Logger object """
+    """ Returns a logging.Logger object
+
+    With PERSONAL_DATA_LOG_ASYNC=1, the logger only enqueues records in a
+    bounded queue (PERSONAL_DATA_LOG_QUEUE_SIZE) and a background listener
+    redacts and writes them in batches (PERSONAL_DATA_LOG_BATCH_SIZE).
+    PERSONAL_DATA_LOG_OVERFLOW selects the overflow policy of the queue.
+    """
     logger = logging.getLogger("user_data")
     logger.setLevel(logging.INFO)
     logger.propagate = False
+    if logger.handlers:
+        # Already configured: don't stack handlers (and listener threads)
+        return logger
 
     stream_handler = logging.StreamHandler()
     formatter = RedactingFormatter(fields=PII_FIELDS)
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    if os.getenv('PERSONAL_DATA_LOG_ASYNC', '0') not in ('1', 'true'):
+        logger.addHandler(stream_handler)
+        return logger
+
+    queue = Queue(int(os.getenv('PERSONAL_DATA_LOG_QUEUE_SIZE', '10000')))
+    queue_handler = RedactingQueueHandler(
+        queue, overflow=os.getenv('PERSONAL_DATA_LOG_OVERFLOW', 'block'))
+    listener = RedactingQueueListener(
+        queue, stream_handler,
+        batch_size=int(os.getenv('PERSONAL_DATA_LOG_BATCH_SIZE', '100')))
+    queue_handler.listener = listener
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(queue_handler)
 
     return logger
 
 
+def get_pool() -> ConnectionPool:
+    """ Returns the process-wide pool of database connections
+
+    Sizes come from PERSONAL_DATA_DB_POOL_MIN/PERSONAL_DATA_DB_POOL_MAX and
+    idle connections above the minimum are closed after
+    PERSONAL_DATA_DB_POOL_IDLE_TIMEOUT seconds.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                connect_db,
+                min_size=int(os.getenv('PERSONAL_DATA_DB_POOL_MIN', '1')),
+                max_size=int(os.getenv('PERSONAL_DATA_DB_POOL_MAX', '5')),
+                idle_timeout=float(
+                    os.getenv('PERSONAL_DATA_DB_POOL_IDLE_TIMEOUT', '300')),
+            )
+        return _pool
+
+
 def get_db() -> connection.MySQLConnection:
+    """ Returns a pooled connection: close() hands it back to the pool
+
+    Use `with get_pool().connection() as db:` to scope a checkout.
+    """
+    return get_pool().acquire()
+
+
+def connect_db() -> connection.MySQLConnection:
     """ Connects to the database using credentials from environment variables """
     username = os.getenv('PERSONAL_DATA_DB_USERNAME', 'root')
     password = os.getenv('PERSONAL_DATA_DB_PASSWORD', '')
     host = os.getenv('PERSONAL_DATA_DB_HOST', 'localhost')
     database = os.getenv('PERSONAL_DATA_DB_NAME')
 
+    if os.getenv('PERSONAL_DATA_DB_DRIVER') == 'sqlite':
+        return get_sqlite_db(database or ':memory:')
+
     conn = mysql.connector.connect(
         user=username,
         password=password,
@@ -63,9 +271,40 @@ def get_db() -> connection.MySQLConnection:
     return conn
 
 
-def main():
-    """ Main function to retrieve and display all rows in the users table """
+def get_sqlite_db(database: str = ':memory:') -> sqlite3.Connection:
+    """ Stand-in for get_db() backed by a sqlite database, for tests """
+    conn = sqlite3.connect(database, check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS users (name VARCHAR(256), "
+        "email VARCHAR(256), phone VARCHAR(16), ssn VARCHAR(16), "
+        "password VARCHAR(256), ip VARCHAR(64), last_login TIMESTAMP, "
+        "user_agent VARCHAR(512));"
+    )
+    return conn
+
+
+def stream_rows(cursor, batch_size: int) -> Iterator[tuple]:
+    """ Yields the rows of an executed cursor, batch_size rows at a time """
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield row
+
+
+def main(batch_size: int = None):
+    """ Main function to retrieve and display all rows in the users table
+
+    Rows are streamed with fetchmany() and logged as they arrive, so memory
+    use does not depend on the size of the table. The batch size defaults
+    to PERSONAL_DATA_DB_BATCH_SIZE (1000 rows).
+    """
+    if batch_size is None:
+        batch_size = int(os.getenv('PERSONAL_DATA_DB_BATCH_SIZE', '1000'))
     db = get_db()
+    # mysql.connector cursors are unbuffered by default: rows stay on the
+    # server until they are fetched
     cursor = db.cursor()
 
     # Execute the query to fetch all rows from the users table
@@ -75,7 +314,7 @@ def main():
     logger = get_logger()
 
     # Log each row with filtered data
-    for row in cursor.fetchall():
+    for row in stream_rows(cursor, batch_size):
         log_message = (
             f"name={row[0]}; email={row[1]}; phone={row[2]}; ssn={row[3]}; "
             f"password={row[4]}; ip={row[5]}; last_login={row[6]}; user_agent={row[7]};"
@@ -87,4 +326,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -8,6 +8,7 @@ from os import getenv
 # Import the appropriate authentication classes
 from api.v1.auth.auth import Auth
 from api.v1.auth.basic_auth import BasicAuth
+from api.v1.auth.path_matcher import compile_excluded_paths
 
 app = Flask(__name__)
 CORS(app)
@@ -23,6 +24,13 @@ if AUTH_TYPE == "basic_auth":
 else:
     auth = Auth()
 
+# Paths that do not require authentication, compiled once
+EXCLUDED_PATHS = compile_excluded_paths((
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+))
+
 # Define routes
 @app.route('/api/v1/status/', methods=['GET'])
 def status():
@@ -45,10 +53,8 @@ def before_request():
     """Filter requests before routing based on authentication."""
     if auth is None:
         return
-    # List of paths that do not require authentication
-    excluded_paths = ['/api/v1/status/', '/api/v1/unauthorized/', '/api/v1/forbidden/']
     # Check if the request path requires authentication
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
     # Check for the Authorization header; if not present, abort with a 401 error
     if auth.authorization_header(request) is None:
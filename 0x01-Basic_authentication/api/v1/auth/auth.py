@@ -3,6 +3,7 @@
 
 from flask import request
 from typing import List, TypeVar
+from api.v1.auth.path_matcher import PathMatcher, compile_excluded_paths
 
 class Auth:
     """Class to manage the API authentication."""
@@ -13,7 +14,8 @@ class Auth:
 
         Args:
             path (str): The request path.
-            excluded_paths (List[str]): A list of paths that do not require authentication.
+            excluded_paths (List[str]): A list of paths that do not require authentication,
+                or a PathMatcher already compiled from such a list.
 
         Returns:
             bool: True if the path requires authentication, False otherwise.
@@ -23,21 +25,11 @@ class Auth:
         if not excluded_paths:
             return True
 
-        # Normalize path by ensuring it ends with a '/'
-        if path[-1] != '/':
-            path += '/'
+        # Compile (or reuse the cached matcher of) the excluded paths
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_excluded_paths(tuple(excluded_paths))
 
-        # Check if the normalized path is in the excluded paths
-        for excluded_path in excluded_paths:
-            # Handle wildcard pattern in excluded paths
-            if excluded_path.endswith('*'):
-                if path.startswith(excluded_path[:-1]):
-                    return False
-            else:
-                if path == excluded_path or path.rstrip('/') == excluded_path.rstrip('/'):
-                    return False
-
-        return True
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""PathMatcher module for precompiled excluded path lookups."""
+
+from functools import lru_cache
+from typing import Tuple
+import re
+
+
+class PathMatcher:
+    """Matcher built once from a list of excluded path patterns."""
+
+    def __init__(self, excluded_paths: Tuple[str, ...]):
+        """
+        Compiles the excluded path patterns.
+
+        Exact entries are stored in a set without their trailing slashes,
+        wildcard entries (ending with '*') are merged in a single regex.
+
+        Args:
+            excluded_paths (Tuple[str, ...]): The excluded path patterns.
+        """
+        self.excluded_paths = tuple(excluded_paths)
+        self.exact = set()
+        prefixes = []
+        for excluded_path in self.excluded_paths:
+            if excluded_path.endswith('*'):
+                prefixes.append(re.escape(excluded_path[:-1]))
+            else:
+                self.exact.add(excluded_path.rstrip('/'))
+        self.prefix_regex = None
+        if prefixes:
+            # Longest prefixes first so the alternation is deterministic
+            prefixes.sort(key=len, reverse=True)
+            self.prefix_regex = re.compile('|'.join(prefixes))
+
+    def __len__(self) -> int:
+        """Returns the number of excluded path patterns."""
+        return len(self.excluded_paths)
+
+    def match(self, path: str) -> bool:
+        """
+        Checks if a path is excluded from authentication.
+
+        Args:
+            path (str): The request path.
+
+        Returns:
+            bool: True if the path matches one of the excluded patterns.
+        """
+        if path.rstrip('/') in self.exact:
+            return True
+        if self.prefix_regex is None:
+            return False
+        # Normalize path by ensuring it ends with a '/'
+        if path[-1:] != '/':
+            path += '/'
+        return self.prefix_regex.match(path) is not None
+
+
+@lru_cache(maxsize=128)
+def compile_excluded_paths(excluded_paths: Tuple[str, ...]) -> PathMatcher:
+    """
+    Returns the cached PathMatcher of a tuple of excluded path patterns.
+
+    Args:
+        excluded_paths (Tuple[str, ...]): The excluded path patterns.
+
+    Returns:
+        PathMatcher: The compiled matcher.
+    """
+    return PathMatcher(excluded_paths)
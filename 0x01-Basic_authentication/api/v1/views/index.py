@@ -2,7 +2,7 @@
 """ Module of Index views
 """
 from flask import jsonify, abort
-from api.v1.views import app_views
+from api.v1.views import app_views, json_response
 
 
 @app_views.route('/status', methods=['GET'], strict_slashes=False)
@@ -23,7 +23,7 @@ def stats() -> str:
     from models.user import User
     stats = {}
     stats['users'] = User.count()
-    return jsonify(stats)
+    return json_response(stats)
 
 
 @app_views.route('/unauthorized', methods=['GET'], strict_slashes=False)
@@ -1,19 +1,66 @@
 #!/usr/bin/env python3
 """ Module of Users views
 """
-from api.v1.views import app_views
-from flask import abort, jsonify, request
+from api.v1.views import app_views, json_response
+from flask import abort, request, Response
+from models.serializer import dumps, encode, encode_many
 from models.user import User
 
 
+MAX_PAGE_SIZE = 1000
+STREAM_THRESHOLD = 100
+
+
+def users_page_response(args: dict):
+    """ Build the GET /api/v1/users response from its query parameters
+    Query parameters:
+      - limit (optional): page size, all users when missing
+      - cursor (optional): next page cursor returned by the previous page
+      - fields (optional): comma separated list of attributes to return
+    Return:
+      - list of User objects JSON represented, streamed for large pages,
+        with the next page cursor in the X-Next-Cursor header
+      - 400 if limit is invalid
+    """
+    fields = args.get('fields')
+    if fields is not None:
+        fields = tuple(f for f in fields.split(',') if f)
+    limit = args.get('limit')
+    next_cursor = None
+    if limit is None:
+        users = User.all()
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0 or limit > MAX_PAGE_SIZE:
+            return json_response({'error': "limit must be between 1 and {}"
+                                  .format(MAX_PAGE_SIZE)}, 400)
+        users, next_cursor = User.page(limit, args.get('cursor'))
+
+    if len(users) > STREAM_THRESHOLD:
+        def generate():
+            yield b'['
+            for i, user in enumerate(users):
+                yield (b',' if i else b'') + dumps(encode(user,
+                                                          fields=fields))
+            yield b']\n'
+        response = Response(generate(), mimetype='application/json')
+    else:
+        response = json_response(encode_many(users, fields))
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, see users_page_response
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    return users_page_response(request.args)
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -30,7 +77,7 @@ def view_one_user(user_id: str = None) -> str:
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return json_response(encode(user))
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -48,7 +95,7 @@ def delete_user(user_id: str = None) -> str:
     if user is None:
         abort(404)
     user.remove()
-    return jsonify({}), 200
+    return json_response({}, 200)
 
 
 @app_views.route('/users', methods=['POST'], strict_slashes=False)
@@ -83,10 +130,10 @@ def create_user() -> str:
             user.first_name = rj.get("first_name")
             user.last_name = rj.get("last_name")
             user.save()
-            return jsonify(user.to_json()), 201
+            return json_response(encode(user), 201)
         except Exception as e:
             error_msg = "Can't create User: {}".format(e)
-    return jsonify({'error': error_msg}), 400
+    return json_response({'error': error_msg}, 400)
 
 
 @app_views.route('/users/<user_id>', methods=['PUT'], strict_slashes=False)
@@ -113,10 +160,10 @@ def update_user(user_id: str = None) -> str:
     except Exception as e:
         rj = None
     if rj is None:
-        return jsonify({'error': "Wrong format"}), 400
+        return json_response({'error': "Wrong format"}, 400)
     if rj.get('first_name') is not None:
         user.first_name = rj.get('first_name')
     if rj.get('last_name') is not None:
         user.last_name = rj.get('last_name')
     user.save()
-    return jsonify(user.to_json()), 200
+    return json_response(encode(user), 200)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+""" Stress benchmark: concurrent save/remove/search on User
+
+Usage: ./bench_concurrency.py [threads] [operations_per_thread]
+
+Writer threads create users, change their emails and remove some of
+them while reader threads search, page and count. Once done, DATA and
+INDEXES are checked against what the writers did, then against a
+reload from the storage files.
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp())
+
+from models.base import DATA, INDEXES  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def writer(n: int, operations: int, expected: dict, errors: list):
+    """ Create, update and remove users, recording the expected state
+    """
+    try:
+        mine = []
+        for i in range(operations):
+            action = random.random()
+            if action < 0.6 or not mine:
+                user = User()
+                user.email = "w{}-{}@hbtn.io".format(n, i)
+                user.save()
+                mine.append(user)
+            elif action < 0.85:
+                user = random.choice(mine)
+                user.email = "w{}-{}-updated@hbtn.io".format(n, i)
+                user.save()
+            else:
+                user = mine.pop(random.randrange(len(mine)))
+                user.remove()
+        expected.update({user.id: user.email for user in mine})
+    except Exception as e:
+        errors.append(e)
+
+
+def reader(stop: threading.Event, errors: list, reads: list):
+    """ Search, page and count until the writers are done
+    """
+    count = 0
+    try:
+        while not stop.is_set():
+            User.search({"email": "w0-0@hbtn.io"})
+            User.all()
+            User.page(50)
+            User.count()
+            count += 4
+    except Exception as e:
+        errors.append(e)
+    reads.append(count)
+
+
+def check(expected: dict) -> list:
+    """ Compare DATA and INDEXES with the expected id -> email state
+    """
+    problems = []
+    if set(DATA["User"].keys()) != set(expected.keys()):
+        problems.append("DATA has {} users, expected {}".format(
+            User.count(), len(expected)))
+    for obj_id, email in expected.items():
+        found = User.search({"email": email})
+        if len(found) != 1 or found[0].id != obj_id:
+            problems.append("email {} resolves to {}".format(email, found))
+    indexed = sum(len(b) for b in INDEXES["User"]["email"].values())
+    if indexed != len(expected):
+        problems.append("{} indexed emails, expected {}".format(
+            indexed, len(expected)))
+    return problems
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    User.load_from_file()
+
+    expected, errors, reads = {}, [], []
+    stop = threading.Event()
+    readers = [threading.Thread(target=reader, args=(stop, errors, reads))
+               for _ in range(threads // 2 or 1)]
+    writers = [threading.Thread(target=writer,
+                                args=(n, operations, expected, errors))
+               for n in range(threads)]
+    start = time.perf_counter()
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for t in readers:
+        t.join()
+    User.flush()
+
+    print("{} writers x {} operations: {:.2f}s, {:.0f} writes/s, "
+          "{} reads".format(threads, operations, elapsed,
+                            threads * operations / elapsed, sum(reads)))
+    problems = ["{}: {}".format(type(e).__name__, e) for e in errors]
+    problems += check(expected)
+    User.load_from_file()
+    problems += ["after reload: " + p for p in check(expected)]
+    for problem in problems[:20]:
+        print(problem)
+    print("FAILED" if problems else "OK")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+""" Startup benchmark: time-to-first-request of User.load_from_file
+
+Usage: ./bench_load.py [user_count ...]
+
+For each user count and storage type, a store is generated in a
+temporary directory, then a fresh interpreter imports the models, loads
+the users and serves a first request (one email lookup and one get).
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STORAGE_TYPES = ("file", "journal", "sharded")
+
+FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+from models.user import User
+User.load_from_file()
+loaded = time.perf_counter()
+user = User.search({"email": "user-0@hbtn.io"})[0]
+assert User.get(user.id) is user
+print(loaded - start, time.perf_counter() - start)
+"""
+
+
+def generate(dir_path: str, count: int):
+    """ Write a .db_User.json file of `count` users
+    """
+    objs = {}
+    for i in range(count):
+        obj_id = str(uuid.uuid4())
+        objs[obj_id] = {
+            "id": obj_id,
+            "created_at": "2024-09-03T20:08:40",
+            "updated_at": "2024-09-03T20:08:40",
+            "email": "user-{}@hbtn.io".format(i),
+            "_password": "7b5f8a2f5164d5310520dc65933d3956f5998d824ae604bc",
+            "first_name": None,
+            "last_name": None,
+        }
+    with open(os.path.join(dir_path, ".db_User.json"), 'w') as f:
+        json.dump(objs, f)
+
+
+def run(dir_path: str, storage_type: str, code: str) -> str:
+    """ Run code in a fresh interpreter using a storage type
+    """
+    env = dict(os.environ, STORAGE_TYPE=storage_type,
+               PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, "-c", code], cwd=dir_path,
+                          env=env, check=True, stdout=subprocess.PIPE,
+                          universal_newlines=True).stdout
+
+
+if __name__ == "__main__":
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    print("{:>9} {:>8} {:>10} {:>14}".format(
+        "users", "storage", "load (s)", "first req (s)"))
+    for count in counts:
+        with tempfile.TemporaryDirectory() as dir_path:
+            generate(dir_path, count)
+            for storage_type in STORAGE_TYPES:
+                if storage_type == "sharded":
+                    # Convert the JSON file into the sharded snapshot
+                    run(dir_path, storage_type, "from models.user import User;"
+                        "User.load_from_file(); User.save_to_file()")
+                load, first = run(dir_path, storage_type,
+                                  FIRST_REQUEST).split()
+                print("{:>9} {:>8} {:>10.3f} {:>14.3f}".format(
+                    count, storage_type, float(load), float(first)))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+""" Memory benchmark: bytes per User for each MODEL_LAYOUT
+
+Usage: ./bench_models.py [user_count]
+
+Each layout runs in a fresh interpreter, which instantiates the users
+from JSON dictionaries (as load_from_file() does); the growth of the
+peak resident set size gives the memory they hold (Linux reports
+ru_maxrss in KiB).
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+LAYOUTS = ("dict", "compact")
+
+MEASURE = """
+import gc
+import resource
+import sys
+import time
+import uuid
+from models.user import User
+
+count = int(sys.argv[1])
+objs_json = [{
+    "id": str(uuid.uuid4()),
+    "created_at": "2024-09-03T20:08:40",
+    "updated_at": "2024-09-03T20:08:4{}".format(i % 10),
+    "email": "user-{}@hbtn.io".format(i),
+    "_password": "7b5f8a2f5164d5310520dc65933d3956f5998d824ae604bc",
+    "first_name": None,
+    "last_name": None,
+} for i in range(count)]
+
+gc.collect()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+users = [User(**obj_json) for obj_json in objs_json]
+elapsed = time.perf_counter() - start
+size = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) * 1024
+start = time.perf_counter()
+for user in users:
+    user.to_json(True)
+print(size / count, elapsed, time.perf_counter() - start)
+"""
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print("{:>9} {:>8} {:>11} {:>12} {:>12}".format(
+        "users", "layout", "bytes/user", "create (s)", "to_json (s)"))
+    for layout in LAYOUTS:
+        env = dict(os.environ, MODEL_LAYOUT=layout, PYTHONPATH=ROOT)
+        out = subprocess.run([sys.executable, "-c", MEASURE, str(count)],
+                             env=env, check=True, stdout=subprocess.PIPE,
+                             universal_newlines=True).stdout
+        size, create, to_json = out.split()
+        print("{:>9} {:>8} {:>11.0f} {:>12.3f} {:>12.3f}".format(
+            count, layout, float(size), float(create), float(to_json)))
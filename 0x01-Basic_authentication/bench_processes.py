@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+""" Stress benchmark: several processes sharing the User store
+
+Usage: ./bench_processes.py [processes] [operations_per_process]
+
+Worker processes (STORAGE_SHARED=1) create users, change their emails
+and remove some of them, as gunicorn workers would. Once all are done,
+each worker checks it sees the writes of all the others, and so does a
+fresh load.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("STORAGE_TYPE", "journal")
+os.environ["STORAGE_SHARED"] = "1"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp())
+
+from models.user import User  # noqa: E402
+
+
+def check(expected: dict) -> list:
+    """ Compare the users seen with the expected id -> email state
+    """
+    problems = []
+    ids = set(user.id for user in User.all())
+    if ids != set(expected.keys()):
+        problems.append("{} users, expected {} ({} missing, {} extra)".format(
+            len(ids), len(expected), len(set(expected) - ids),
+            len(ids - set(expected))))
+    for obj_id, email in expected.items():
+        found = User.search({"email": email})
+        if len(found) != 1 or found[0].id != obj_id:
+            problems.append("email {} resolves to {}".format(email, found))
+    return problems
+
+
+def worker(n: int, operations: int, results, expected_queue):
+    """ Write, then check the writes of every worker are seen
+    """
+    User.load_from_file()
+    mine = []
+    for i in range(operations):
+        action = random.random()
+        if action < 0.6 or not mine:
+            user = User()
+            user.email = "p{}-{}@hbtn.io".format(n, i)
+            user.save()
+            mine.append(user)
+        elif action < 0.85:
+            user = random.choice(mine)
+            user.email = "p{}-{}-updated@hbtn.io".format(n, i)
+            user.save()
+        else:
+            mine.pop(random.randrange(len(mine))).remove()
+        # Requests read too, which applies the writes of the others
+        User.count()
+    results.put({user.id: user.email for user in mine})
+    results.put(["worker {}: {}".format(n, problem)
+                 for problem in check(expected_queue.get())])
+
+
+if __name__ == "__main__":
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    results = multiprocessing.Queue()
+    expected_queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(
+        target=worker, args=(n, operations, results, expected_queue))
+        for n in range(processes)]
+
+    start = time.perf_counter()
+    for p in workers:
+        p.start()
+    expected = {}
+    for _ in workers:
+        expected.update(results.get())
+    elapsed = time.perf_counter() - start
+    for _ in workers:
+        expected_queue.put(expected)
+    problems = []
+    for _ in workers:
+        problems += results.get()
+    for p in workers:
+        p.join()
+
+    print("{} processes x {} operations: {:.2f}s, {:.0f} writes/s".format(
+        processes, operations, elapsed, processes * operations / elapsed))
+    User.load_from_file()
+    problems += ["fresh load: " + p for p in check(expected)]
+    for problem in problems[:20]:
+        print(problem)
+    print("FAILED" if problems else "OK")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+""" FileStorage module
+"""
+from os import path
+from typing import Dict, List, TypeVar
+import json
+import os
+
+
+class FileStorage():
+    """ Storage engine writing the whole class in one JSON file
+    """
+
+    def file_path(self, cls) -> str:
+        """ Path of the JSON file of a class
+        """
+        return ".db_{}.json".format(cls.__name__)
+
+    def load(self, cls) -> Dict[str, TypeVar('Base')]:
+        """ Load all objects of a class
+        """
+        objs = {}
+        file_path = self.file_path(cls)
+        if not path.exists(file_path):
+            return objs
+
+        with open(file_path, 'r') as f:
+            objs_json = json.load(f)
+            for obj_id, obj_json in objs_json.items():
+                objs[obj_id] = cls(**obj_json)
+        return objs
+
+    def save_all(self, cls, objs: Dict[str, TypeVar('Base')]):
+        """ Write all objects of a class
+        """
+        objs_json = {}
+        for obj_id, obj in objs.items():
+            objs_json[obj_id] = obj.to_json(True)
+
+        # Write a temporary file renamed over the previous one, so readers
+        # and crashes never see a partial file
+        file_path = self.file_path(cls)
+        tmp_path = "{}.{}.tmp".format(file_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(objs_json, f)
+        os.replace(tmp_path, file_path)
+
+    def upsert(self, cls, obj: TypeVar('Base'),
+               objs: Dict[str, TypeVar('Base')]):
+        """ Persist a created or updated object
+        """
+        self.save_all(cls, objs)
+
+    def delete(self, cls, obj_id: str, objs: Dict[str, TypeVar('Base')]):
+        """ Persist the removal of an object
+        """
+        self.save_all(cls, objs)
+
+    def has_changes(self, cls) -> bool:
+        """ Whether other processes wrote objects of a class: not shared
+        """
+        return False
+
+    def changes(self, cls) -> List[dict]:
+        """ Records written by other processes: not shared
+        """
+        return []
+
+    def wait(self, token):
+        """ Wait until the write returned `token` is on disk: it already is
+        """
+
+    def flush(self):
+        """ Nothing is buffered: every write is already on disk
+        """
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+""" JournalStorage module
+"""
+from os import path, getenv
+from typing import Dict, List, Optional, TypeVar
+import fcntl
+import json
+import os
+import threading
+
+from models.engine.file_storage import FileStorage
+from models.engine.shared_journal import SharedJournal
+
+
+class JournalStorage(FileStorage):
+    """ Storage engine appending every write to a journal file
+
+    The `.db_<Class>.json` file is kept as a snapshot and each `save()` or
+    `remove()` only appends one line to `.db_<Class>.journal`. Loading
+    replays the journal on top of the snapshot, and the journal is
+    compacted into a new snapshot every `compact_every` records.
+
+    Compaction stays off the writer's path: the journal is renamed to
+    `.db_<Class>.journal.old` and appends continue in a new one, while a
+    background thread writes the snapshot from a shallow copy of the
+    objects and then removes the old journal. Until then, loading replays
+    both journals.
+
+    When `shared`, several processes (e.g. gunicorn workers) use the same
+    files: writes are serialized by a lock file and each process applies
+    the records of the others (see SharedJournal, `changes()`).
+    """
+
+    def __init__(self, compact_every: int = None, shared: bool = None):
+        """ Initialize a JournalStorage instance
+        """
+        if compact_every is None:
+            compact_every = int(getenv("STORAGE_COMPACT_EVERY", "1000"))
+        if shared is None:
+            shared = getenv("STORAGE_SHARED", "0") == "1"
+        self.compact_every = compact_every
+        self.shared = shared
+        self.__journals = {}
+        self.__records = {}
+        self.__shared = {}
+        self.__compactions = {}
+        # Journal files and compactions of every class
+        self.__lock = threading.Lock()
+
+    def journal_path(self, cls) -> str:
+        """ Path of the journal file of a class
+        """
+        return ".db_{}.journal".format(cls.__name__)
+
+    def old_journal_path(self, cls) -> str:
+        """ Path of the journal being compacted into the snapshot
+        """
+        return ".db_{}.journal.old".format(cls.__name__)
+
+    def lock_path(self, cls) -> str:
+        """ Path of the lock file of a class, in shared mode
+        """
+        return ".db_{}.lock".format(cls.__name__)
+
+    def load(self, cls) -> Dict[str, TypeVar('Base')]:
+        """ Load the snapshot and replay the journal
+        """
+        if self.shared:
+            journal = self._shared_journal(cls)
+            # A compaction swaps snapshot and journal: not in the middle
+            with journal.locked(fcntl.LOCK_SH):
+                objs = self._load_snapshot(cls)
+                for record in journal.reset():
+                    self._apply(cls, objs, record)
+            return objs
+
+        self._wait_compaction(cls)
+        objs = self._load_snapshot(cls)
+        old_journal = path.exists(self.old_journal_path(cls))
+        if old_journal:
+            # Compaction interrupted by a crash
+            self._replay(cls, objs, self.old_journal_path(cls))
+        records = self._replay(cls, objs, self.journal_path(cls))
+        self.__records[cls.__name__] = records
+        if old_journal:
+            self.save_all(cls, objs)
+        return objs
+
+    def _replay(self, cls, objs: Dict[str, TypeVar('Base')],
+                journal_path: str) -> int:
+        """ Apply the records of a journal file, return their number
+        """
+        records = 0
+        if not path.exists(journal_path):
+            return records
+        with open(journal_path, 'rb+') as f:
+            end = 0
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("Torn line")
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line after a crash: cut it off, the
+                    # next appends would be glued onto it otherwise
+                    f.truncate(end)
+                    break
+                self._apply(cls, objs, record)
+                records += 1
+                end += len(line)
+        return records
+
+    def save_all(self, cls, objs: Dict[str, TypeVar('Base')]):
+        """ Compact: write a new snapshot and truncate the journal
+        """
+        s_class = cls.__name__
+        if self.shared:
+            self._compact_shared(cls, force=True)
+            return
+        # A compaction finishing later would replace this snapshot
+        self._wait_compaction(cls)
+        with self.__lock:
+            self._write_snapshot(cls, objs)
+            journal = self.__journals.pop(s_class, None)
+            if journal is not None:
+                journal.close()
+            open(self.journal_path(cls), 'w').close()
+            if path.exists(self.old_journal_path(cls)):
+                os.remove(self.old_journal_path(cls))
+            self.__records[s_class] = 0
+
+    def _load_snapshot(self, cls) -> Dict[str, TypeVar('Base')]:
+        """ Load the objects of the last snapshot
+        """
+        return super().load(cls)
+
+    def _write_snapshot(self, cls, objs: Dict[str, TypeVar('Base')]):
+        """ Atomically replace the snapshot with the given objects
+        """
+        file_path = self.file_path(cls)
+        tmp_path = "{}.tmp".format(file_path)
+        objs_json = {}
+        for obj_id, obj in objs.items():
+            objs_json[obj_id] = obj.to_json(True)
+
+        with open(tmp_path, 'w') as f:
+            json.dump(objs_json, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+
+    def upsert(self, cls, obj: TypeVar('Base'),
+               objs: Dict[str, TypeVar('Base')]):
+        """ Append an upsert record
+        """
+        self._append(cls, {"op": "upsert", "id": obj.id,
+                           "obj": obj.to_json(True)}, objs)
+
+    def delete(self, cls, obj_id: str, objs: Dict[str, TypeVar('Base')]):
+        """ Append a delete record
+        """
+        self._append(cls, {"op": "delete", "id": obj_id}, objs)
+
+    def sync(self, cls):
+        """ fsync the records appended so far to the journal of a class
+
+        The rotated journals of a compaction are fsynced before being
+        renamed, so only the current one is left. The descriptor is
+        duplicated, so appends go on during the fsync.
+        """
+        with self.__lock:
+            journal = self.__journals.get(cls.__name__)
+            if journal is None:
+                return
+            fd = os.dup(journal.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def has_changes(self, cls) -> bool:
+        """ Whether other processes wrote objects of a class
+        """
+        journal = self.__shared.get(cls.__name__)
+        return journal is not None and journal.has_changes()
+
+    def changes(self, cls) -> Optional[List[dict]]:
+        """ Records written by other processes, None if a reload is needed
+        """
+        journal = self.__shared.get(cls.__name__)
+        if journal is None:
+            return []
+        return journal.changes()
+
+    def _shared_journal(self, cls) -> SharedJournal:
+        """ SharedJournal of a class
+        """
+        journal = self.__shared.get(cls.__name__)
+        if journal is None:
+            journal = SharedJournal(self.journal_path(cls),
+                                    self.lock_path(cls))
+            self.__shared[cls.__name__] = journal
+        return journal
+
+    def _compact_shared(self, cls, force: bool = False):
+        """ Compact from the files, which include every process' writes
+
+        Loaded objects may miss records of other processes: the snapshot
+        is rebuilt from the current snapshot and journal instead. Unless
+        forced, nothing is done if another process just compacted.
+        """
+        journal = self._shared_journal(cls)
+        with journal.locked():
+            if not journal.catch_up():
+                journal.reload = True
+            if not force and journal.records < self.compact_every:
+                return
+            objs = self._load_snapshot(cls)
+            if path.exists(self.journal_path(cls)):
+                with open(self.journal_path(cls), 'r') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            break
+                        self._apply(cls, objs, record)
+            self._write_snapshot(cls, objs)
+            journal.replace()
+
+    def _append(self, cls, record: dict, objs: Dict[str, TypeVar('Base')]):
+        """ Write one record and compact when the journal is too long
+        """
+        s_class = cls.__name__
+        if self.shared:
+            journal = self._shared_journal(cls)
+            with journal.locked():
+                journal.append(record)
+            if self.compact_every > 0 and \
+                    journal.records >= self.compact_every:
+                self._compact_shared(cls)
+            return
+
+        line = json.dumps(record) + "\n"
+        with self.__lock:
+            journal = self.__journals.get(s_class)
+            if journal is None:
+                journal = open(self.journal_path(cls), 'a')
+                self.__journals[s_class] = journal
+            journal.write(line)
+            journal.flush()
+
+            self.__records[s_class] = self.__records.get(s_class, 0) + 1
+            if self.compact_every > 0 and \
+                    self.__records[s_class] >= self.compact_every and \
+                    s_class not in self.__compactions:
+                self._start_compaction(cls, objs)
+
+    def _start_compaction(self, cls, objs: Dict[str, TypeVar('Base')]):
+        """ Rotate the journal and write the snapshot in the background
+
+        With the lock held. Only the shallow copy of the objects costs
+        O(n) on the writer's path. If the previous compaction failed, its
+        old journal is still there: the snapshot is retried without
+        rotating, the current journal being replayed on top of it anyway.
+        """
+        s_class = cls.__name__
+        old_path = self.old_journal_path(cls)
+        if not path.exists(old_path):
+            journal = self.__journals.pop(s_class, None)
+            if journal is not None:
+                os.fsync(journal.fileno())
+                journal.close()
+            os.rename(self.journal_path(cls), old_path)
+            self.__records[s_class] = 0
+        thread = threading.Thread(target=self._compact,
+                                  args=(cls, objs.copy()), daemon=True,
+                                  name="compaction-{}".format(s_class))
+        self.__compactions[s_class] = thread
+        thread.start()
+
+    def _compact(self, cls, objs: Dict[str, TypeVar('Base')]):
+        """ Compaction thread: snapshot, then drop the old journal
+        """
+        try:
+            self._write_snapshot(cls, objs)
+            os.remove(self.old_journal_path(cls))
+        except Exception:
+            # The old journal stays: replayed by loads, retried later
+            pass
+        finally:
+            with self.__lock:
+                self.__compactions.pop(cls.__name__, None)
+
+    def _wait_compaction(self, cls):
+        """ Wait for the running compaction of a class, if any
+        """
+        thread = self.__compactions.get(cls.__name__)
+        if thread is not None:
+            thread.join()
+
+    def _apply(self, cls, objs: Dict[str, TypeVar('Base')], record: dict):
+        """ Apply one journal record to a dict of objects
+        """
+        if record.get("op") == "upsert":
+            objs[record["id"]] = cls(**record["obj"])
+        elif record.get("op") == "delete":
+            objs.pop(record["id"], None)
@@ -4,10 +4,12 @@ API V1 Route for Holberton AirBnB project
 """
 from os import getenv
 from api.v1.views import app_views
-from flask import Flask, jsonify, abort, request
+from flask import Flask, jsonify, abort, request, g
 from flask_cors import CORS
 from api.v1.auth.auth import Auth
+from api.v1.auth.basic_auth import BasicAuth
 from api.v1.auth.session_auth import SessionAuth
+from api.v1.auth.path_matcher import compile_excluded_paths
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
@@ -17,9 +19,44 @@ auth = None
 auth_type = getenv('AUTH_TYPE')
 if auth_type == "session_auth":
     auth = SessionAuth()
+elif auth_type == "basic_auth":
+    auth = BasicAuth()
 else:
     auth = Auth()
 
+# Paths that do not require authentication, compiled once
+EXCLUDED_PATHS = compile_excluded_paths((
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/',
+))
+
+
+@app.before_request
+def before_request() -> None:
+    """ Resolves the current user once per request
+
+    The user is stored on request.current_user and g.current_user for the
+    views; later auth.current_user(request) calls reuse it. Protected
+    paths answer 401/403 only with an authenticating AUTH_TYPE
+    (basic_auth or session_auth): the base Auth knows no user.
+    """
+    request.current_user = None
+    g.current_user = None
+    if type(auth) is Auth:
+        return
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
+        return
+    if auth.authorization_header(request) is None and \
+            auth.session_cookie(request) is None:
+        abort(401)
+    user = auth.current_user(request)
+    if user is None:
+        abort(403)
+    request.current_user = user
+    g.current_user = user
+
 @app.errorhandler(404)
 def not_found(error) -> str:
     """ Not found handler """
@@ -2,9 +2,42 @@
 """Auth module for API authentication management."""
 
 from flask import request
-from typing import List, TypeVar
+from functools import wraps
+from typing import Callable, List, TypeVar
+from api.v1.auth.path_matcher import PathMatcher, compile_excluded_paths
 import os
 
+_MISSING = object()
+
+
+def per_request(method: Callable) -> Callable:
+    """
+    Memoizes an Auth method on the request object it is called with.
+
+    The first call parses the request and stores the result on the request,
+    so later calls within the same request return it without any parsing
+    or lookup.
+
+    Args:
+        method (Callable): An Auth method taking the request as argument.
+
+    Returns:
+        Callable: The memoized method.
+    """
+    attribute = "_auth_{}".format(method.__name__)
+
+    @wraps(method)
+    def wrapper(self, request=None):
+        if request is None:
+            return method(self, request)
+        result = getattr(request, attribute, _MISSING)
+        if result is _MISSING:
+            result = method(self, request)
+            setattr(request, attribute, result)
+        return result
+    return wrapper
+
+
 class Auth:
     """Class to manage the API authentication."""
 
@@ -14,7 +47,8 @@ class Auth:
 
         Args:
             path (str): The request path.
-            excluded_paths (List[str]): A list of paths that do not require authentication.
+            excluded_paths (List[str]): A list of paths that do not require authentication,
+                or a PathMatcher already compiled from such a list.
 
         Returns:
             bool: True if the path requires authentication, False otherwise.
@@ -24,21 +58,11 @@ class Auth:
         if not excluded_paths:
             return True
 
-        # Normalize path by ensuring it ends with a '/'
-        if path[-1] != '/':
-            path += '/'
-
-        # Check if the normalized path is in the excluded paths
-        for excluded_path in excluded_paths:
-            # Handle wildcard pattern in excluded paths
-            if excluded_path.endswith('*'):
-                if path.startswith(excluded_path[:-1]):
-                    return False
-            else:
-                if path == excluded_path or path.rstrip('/') == excluded_path.rstrip('/'):
-                    return False
+        # Compile (or reuse the cached matcher of) the excluded paths
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_excluded_paths(tuple(excluded_paths))
 
-        return True
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """
@@ -54,6 +78,7 @@ class Auth:
             return None
         return request.headers.get('Authorization')
 
+    @per_request
     def current_user(self, request=None) -> TypeVar('User'):
         """
         Returns the current user from the request, if available.
@@ -5,13 +5,15 @@ BasicAuth module
 import base64
 from typing import TypeVar
 from models.user import User
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, per_request
+from api.v1.auth.credential_cache import CredentialCache
 
 
 class BasicAuth(Auth):
     """
     BasicAuth class that implements Basic Authentication
     """
+    credential_cache = CredentialCache()
 
     def extract_base64_authorization_header(self, authorization_header: str) -> str:
         """
@@ -73,6 +75,7 @@ class BasicAuth(Auth):
 
         return user
 
+    @per_request
     def current_user(self, request=None) -> TypeVar('User'):
         """
         Retrieves the User instance for a request
@@ -81,6 +84,10 @@ class BasicAuth(Auth):
         if auth_header is None:
             return None
 
+        user = self.credential_cache.get(auth_header)
+        if user is not None:
+            return user
+
         base64_header = self.extract_base64_authorization_header(auth_header)
         if base64_header is None:
             return None
@@ -93,5 +100,8 @@ class BasicAuth(Auth):
         if email is None or password is None:
             return None
 
-        return self.user_object_from_credentials(email, password)
+        user = self.user_object_from_credentials(email, password)
+        if user is not None:
+            self.credential_cache.put(auth_header, user)
+        return user
 
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+CredentialCache module
+"""
+from collections import OrderedDict
+from os import getenv
+from typing import TypeVar
+import hashlib
+import hmac
+import os
+import threading
+import time
+from models.user import User
+
+
+class CredentialCache:
+    """
+    Bounded TTL/LRU cache of verified Basic Authorization headers
+
+    Entries are keyed by an HMAC of the raw header (the credentials are
+    never kept in memory) and map to the user ID, email and password hash
+    that were verified. A hit is only valid while the user still exists
+    with the same email and password hash: the entries of a removed user
+    or of an old password are dropped on their next lookup, and evicted
+    by the TTL and LRU bounds meanwhile.
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None):
+        """
+        Initializes the cache from BASIC_AUTH_CACHE_SIZE and
+        BASIC_AUTH_CACHE_TTL (seconds) unless explicit values are given.
+        """
+        if max_size is None:
+            max_size = int(getenv("BASIC_AUTH_CACHE_SIZE", "1024"))
+        if ttl is None:
+            ttl = float(getenv("BASIC_AUTH_CACHE_TTL", "300"))
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__key = os.urandom(32)
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def _digest(self, authorization_header: str) -> bytes:
+        """
+        Returns the keyed digest of a raw Authorization header
+        """
+        return hmac.new(self.__key, authorization_header.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def get(self, authorization_header: str) -> TypeVar('User'):
+        """
+        Returns the User cached for a header, or None on a miss
+        """
+        if self.max_size <= 0 or not isinstance(authorization_header, str):
+            return None
+        digest = self._digest(authorization_header)
+        with self.__lock:
+            entry = self.__entries.get(digest)
+            if entry is not None and entry[3] < time.monotonic():
+                del self.__entries[digest]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+        user_id, email, password, _ = entry
+        user = User.get(user_id)
+        with self.__lock:
+            if user is None or user.email != email or \
+                    user.password != password:
+                self.__entries.pop(digest, None)
+                self.misses += 1
+                return None
+            if digest in self.__entries:
+                self.__entries.move_to_end(digest)
+            self.hits += 1
+        return user
+
+    def put(self, authorization_header: str, user: TypeVar('User')):
+        """
+        Caches a header that was verified for a user
+        """
+        if self.max_size <= 0 or not isinstance(authorization_header, str):
+            return
+        digest = self._digest(authorization_header)
+        entry = (user.id, user.email, user.password,
+                 time.monotonic() + self.ttl)
+        with self.__lock:
+            self.__entries[digest] = entry
+            self.__entries.move_to_end(digest)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drops every entry and resets the counters
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss counters and the current size
+        """
+        with self.__lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self.__entries)}
@@ -2,7 +2,8 @@
 """
 Session Authentication class
 """
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, per_request
+from api.v1.auth.session_store import session_store_from_env
 import uuid
 from typing import Union, Any
 from models.user import User
@@ -12,6 +13,17 @@ class SessionAuth(Auth):
     Session Authentication class that inherits from Auth
     """
     user_id_by_session_id = {}
+    session_store = None
+
+    def __init__(self):
+        """
+        Initializes the session store shared by every SessionAuth.
+
+        The in-memory store (the default) is backed by user_id_by_session_id.
+        """
+        if SessionAuth.session_store is None:
+            SessionAuth.session_store = session_store_from_env(
+                SessionAuth.user_id_by_session_id)
 
     def create_session(self, user_id: str = None) -> str:
         """
@@ -27,7 +39,7 @@ class SessionAuth(Auth):
             return None
 
         session_id = str(uuid.uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        self.session_store.set(session_id, user_id)
         return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> Union[str, None]:
@@ -43,8 +55,9 @@ class SessionAuth(Auth):
         if session_id is None or not isinstance(session_id, str):
             return None
 
-        return self.user_id_by_session_id.get(session_id)
+        return self.session_store.get(session_id)
 
+    @per_request
     def current_user(self, request: Union[Any, None] = None) -> Union[User, None]:
         """
         Returns a User instance based on a cookie value.
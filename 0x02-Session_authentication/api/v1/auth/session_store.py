@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Session stores used by SessionAuth
+"""
+import fcntl
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Union
+
+
+class SessionStore(ABC):
+    """
+    Interface of a store mapping Session IDs to User IDs
+
+    Args:
+        ttl (float): Lifetime of a session in seconds, 0 for no expiry.
+    """
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+
+    def _expires_at(self) -> Union[float, None]:
+        """
+        Returns the expiry timestamp of a session created now.
+        """
+        if self.ttl <= 0:
+            return None
+        return time.time() + self.ttl
+
+    @abstractmethod
+    def set(self, session_id: str, user_id: str):
+        """
+        Stores the User ID of a Session ID.
+        """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Union[str, None]:
+        """
+        Returns the User ID of a live Session ID, otherwise None.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes a Session ID, returns True if it existed.
+        """
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Per-process store with TTL expiry and a bounded number of sessions
+
+    Session IDs map to User IDs in a plain dict. Expiry times live in a
+    heap, so expired sessions are purged in O(log n) each, and when the
+    store is over max_size the sessions closest to expiry (the oldest ones
+    without TTL) are evicted first.
+    """
+
+    def __init__(self, ttl: float = 0, max_size: int = 0, data: dict = None):
+        super().__init__(ttl)
+        self.max_size = max_size
+        self.data = data if data is not None else {}
+        self.__deadlines = {}
+        self.__heap = []
+        self.__lock = threading.Lock()
+
+    def set(self, session_id: str, user_id: str):
+        """
+        Stores the User ID of a Session ID.
+        """
+        expires_at = self._expires_at()
+        # Without TTL the creation time orders evictions
+        deadline = expires_at if expires_at is not None else time.time()
+        with self.__lock:
+            self.data[session_id] = user_id
+            self.__deadlines[session_id] = deadline
+            heapq.heappush(self.__heap, (deadline, session_id))
+            self._purge()
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """
+        Returns the User ID of a live Session ID, otherwise None.
+        """
+        with self.__lock:
+            self._purge()
+            return self.data.get(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes a Session ID, returns True if it existed.
+        """
+        with self.__lock:
+            self.__deadlines.pop(session_id, None)
+            return self.data.pop(session_id, None) is not None
+
+    def _purge(self):
+        """
+        Drops expired sessions and evicts sessions over max_size.
+        """
+        now = time.time()
+        while self.__heap:
+            deadline, session_id = self.__heap[0]
+            if self.__deadlines.get(session_id) != deadline:
+                # Stale heap entry: the session was deleted or re-set
+                heapq.heappop(self.__heap)
+                continue
+            expired = self.ttl > 0 and deadline <= now
+            full = self.max_size > 0 and len(self.data) > self.max_size
+            if not expired and not full:
+                break
+            heapq.heappop(self.__heap)
+            del self.__deadlines[session_id]
+            self.data.pop(session_id, None)
+
+
+class FileSessionStore(SessionStore):
+    """
+    Store persisted in a JSON file, shared by processes on the same host
+
+    The file is re-read only when its signature (inode, size and
+    modification time) changes, so two replaces within one timestamp tick
+    are still noticed. It is replaced atomically on every write, under an
+    exclusive lock on a sibling ".lock" file so concurrent writers don't
+    lose sessions.
+    """
+
+    def __init__(self, path: str = ".db_Session.json", ttl: float = 0):
+        super().__init__(ttl)
+        self.path = path
+        self.__sessions = {}
+        self.__signature = None
+        self.__lock = threading.Lock()
+
+    def _reload(self):
+        """
+        Reads the file again if another process changed it.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.__sessions, self.__signature = {}, None
+            return
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if signature == self.__signature:
+            return
+        with open(self.path, 'r') as f:
+            self.__sessions = json.load(f)
+            st = os.fstat(f.fileno())
+        # Of the file read, even if it was replaced since the stat()
+        self.__signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _write(self):
+        """
+        Writes live sessions to a temporary file renamed over the store.
+        """
+        now = time.time()
+        self.__sessions = {
+            session_id: session
+            for session_id, session in self.__sessions.items()
+            if session["expires_at"] is None or session["expires_at"] > now
+        }
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(self.__sessions, f)
+            f.flush()
+            # The rename keeps inode, size and modification time
+            st = os.fstat(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.__signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    @contextmanager
+    def _locked(self):
+        """
+        Holds the thread lock and the inter-process file lock.
+        """
+        with self.__lock:
+            with open("{}.lock".format(self.path), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def set(self, session_id: str, user_id: str):
+        """
+        Stores the User ID of a Session ID.
+        """
+        with self._locked():
+            self._reload()
+            self.__sessions[session_id] = {"user_id": user_id,
+                                           "expires_at": self._expires_at()}
+            self._write()
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """
+        Returns the User ID of a live Session ID, otherwise None.
+        """
+        with self.__lock:
+            self._reload()
+            session = self.__sessions.get(session_id)
+        if session is None:
+            return None
+        if session["expires_at"] is not None and \
+                session["expires_at"] <= time.time():
+            return None
+        return session["user_id"]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes a Session ID, returns True if it existed.
+        """
+        with self._locked():
+            self._reload()
+            if self.__sessions.pop(session_id, None) is None:
+                return False
+            self._write()
+            return True
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Store kept in a sqlite database, shared by every worker process
+
+    Each thread uses its own connection; the database runs in WAL mode so
+    readers don't block the writer.
+    """
+
+    def __init__(self, path: str = ".db_Session.sqlite", ttl: float = 0):
+        super().__init__(ttl)
+        self.path = path
+        self.__local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                         "session_id TEXT PRIMARY KEY, "
+                         "user_id TEXT NOT NULL, "
+                         "expires_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at "
+                         "ON sessions (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current thread.
+        """
+        conn = getattr(self.__local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.__local.conn = conn
+        return conn
+
+    def set(self, session_id: str, user_id: str):
+        """
+        Stores the User ID of a Session ID and purges expired sessions.
+        """
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions "
+                         "(session_id, user_id, expires_at) VALUES (?, ?, ?)",
+                         (session_id, user_id, self._expires_at()))
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?",
+                         (time.time(),))
+
+    def get(self, session_id: str) -> Union[str, None]:
+        """
+        Returns the User ID of a live Session ID, otherwise None.
+        """
+        row = self._connection().execute(
+            "SELECT user_id FROM sessions WHERE session_id = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (session_id, time.time())).fetchone()
+        return row[0] if row is not None else None
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Removes a Session ID, returns True if it existed.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute("DELETE FROM sessions WHERE session_id = ?",
+                                  (session_id,))
+            return cursor.rowcount > 0
+
+
+def session_store_from_env(data: dict = None) -> SessionStore:
+    """
+    Builds the session store selected by the environment.
+
+    SESSION_STORE picks "memory" (default), "file" or "sqlite",
+    SESSION_DURATION sets the lifetime of a session in seconds (0 or unset
+    for no expiry), SESSION_MAX bounds the in-memory store and
+    SESSION_STORE_PATH sets the file of the file and sqlite stores.
+
+    Args:
+        data (dict): The dict backing the in-memory store.
+    """
+    store_type = os.getenv("SESSION_STORE", "memory")
+    try:
+        ttl = float(os.getenv("SESSION_DURATION", "0"))
+    except ValueError:
+        ttl = 0
+    path = os.getenv("SESSION_STORE_PATH")
+    if store_type == "file":
+        return FileSessionStore(path or ".db_Session.json", ttl)
+    if store_type == "sqlite":
+        return SqliteSessionStore(path or ".db_Session.sqlite", ttl)
+    return MemorySessionStore(ttl, int(os.getenv("SESSION_MAX", "0")), data)
@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 """ DocDocDocDocDocDoc
 """
-from flask import Blueprint
+from flask import Blueprint, Response
+from models.serializer import dumps
 
 app_views = Blueprint("app_views", __name__, url_prefix="/api/v1")
 
+
+def json_response(data, status: int = 200) -> Response:
+    """ JSON response encoded by the serializer backend
+    """
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
 from api.v1.views.index import *
 from api.v1.views.users import *
 from api.v1.views.session_auth import *  # Add this line to include session authentication
@@ -2,18 +2,66 @@
 """
 Module for the Users endpoints.
 """
-from flask import jsonify, abort
-from api.v1.views import app_views
+from flask import abort, request, Response
+from api.v1.views import app_views, json_response
+from models.serializer import dumps, encode, encode_many
 from models.user import User
 
 
+MAX_PAGE_SIZE = 1000
+STREAM_THRESHOLD = 100
+
+
+def users_page_response(args: dict):
+    """ Build the GET /api/v1/users response from its query parameters
+    Query parameters:
+      - limit (optional): page size, all users when missing
+      - cursor (optional): next page cursor returned by the previous page
+      - fields (optional): comma separated list of attributes to return
+    Return:
+      - list of User objects JSON represented, streamed for large pages,
+        with the next page cursor in the X-Next-Cursor header
+      - 400 if limit is invalid
+    """
+    fields = args.get('fields')
+    if fields is not None:
+        fields = tuple(f for f in fields.split(',') if f)
+    limit = args.get('limit')
+    next_cursor = None
+    if limit is None:
+        users = User.all()
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0 or limit > MAX_PAGE_SIZE:
+            return json_response({'error': "limit must be between 1 and {}"
+                                  .format(MAX_PAGE_SIZE)}, 400)
+        users, next_cursor = User.page(limit, args.get('cursor'))
+
+    if len(users) > STREAM_THRESHOLD:
+        def generate():
+            yield b'['
+            for i, user in enumerate(users):
+                yield (b',' if i else b'') + dumps(encode(user,
+                                                          fields=fields))
+            yield b']\n'
+        response = Response(generate(), mimetype='application/json')
+    else:
+        response = json_response(encode_many(users, fields))
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def get_users():
     """
-    Retrieves all users.
+    Retrieves all users, one page at a time with limit/cursor,
+    restricted to the attributes listed in fields.
     """
-    all_users = User.all()
-    return jsonify([user.to_json() for user in all_users])
+    return users_page_response(request.args)
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -21,14 +69,14 @@ def get_user(user_id):
     """
     Retrieves a user by ID.
     """
+    if user_id == "me":
+        if request.current_user is None:
+            abort(404)
+        return json_response(encode(request.current_user))
     user = User.get(user_id)
     if user is None:
         abort(404)
-    if user_id == "me" and request.current_user is None:
-        abort(404)
-    if user_id == "me" and request.current_user is not None:
-        return jsonify(request.current_user.to_json())
-    return jsonify(user.to_json())
+    return json_response(encode(user))
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -40,7 +88,7 @@ def delete_user(user_id):
     if user is None:
         abort(404)
     user.delete()
-    return jsonify({}), 204
+    return json_response({}, 204)
 
 
 @app_views.route('/users', methods=['POST'], strict_slashes=False)
@@ -58,7 +106,7 @@ def create_user():
     user.password = req.get('password')
     if not user.save():
         abort(500)
-    return jsonify(user.to_json()), 201
+    return json_response(encode(user), 201)
 
 
 @app_views.route('/users/<user_id>', methods=['PUT'], strict_slashes=False)
@@ -72,8 +120,13 @@ def update_user(user_id):
     req = request.get_json()
     if not req:
         abort(400, description="Not a JSON")
+    if not hasattr(user, '__dict__'):
+        # Compact layout: only the declared attributes have a slot
+        for key in req:
+            if not hasattr(User, key):
+                abort(400, description="Unknown attribute: {}".format(key))
     for key, value in req.items():
         setattr(user, key, value)
     if not user.save():
         abort(500)
-    return jsonify(user.to_json()), 200
+    return json_response(encode(user), 200)
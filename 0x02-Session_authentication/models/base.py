@@ -2,28 +2,131 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import TypeVar, List, Iterable, Tuple
+from os import getenv
+import calendar
+import heapq
+import threading
+import time
 import uuid
 
+from models.engine.background_storage import BackgroundStorage
+from models.engine.file_storage import FileStorage
+from models.engine.journal_storage import JournalStorage
+from models.engine.sharded_storage import ShardedStorage
+from models.serializer import TIMESTAMP_FORMAT, encode
+
 
-TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+LOCKS = {}
+
+# "compact" models use __slots__ and keep timestamps as integer epochs
+COMPACT_MODELS = getenv("MODEL_LAYOUT", "dict") == "compact"
+
+storage = None
+if getenv("STORAGE_TYPE") == "journal":
+    storage = JournalStorage()
+elif getenv("STORAGE_TYPE") == "sharded":
+    storage = ShardedStorage()
+else:
+    storage = FileStorage()
+
+# STORAGE_SHARED=1: several processes share the files (see JournalStorage)
+if getenv("STORAGE_SHARED", "0") == "1":
+    if not getattr(storage, 'shared', False):
+        raise ValueError("STORAGE_SHARED requires the journal or sharded "
+                         "STORAGE_TYPE")
+    if getenv("STORAGE_DURABILITY", "sync") != "sync":
+        raise ValueError("STORAGE_SHARED requires the sync "
+                         "STORAGE_DURABILITY")
+
+# "sync" writes in save()/remove(), "group" and "async" hand the writes
+# (the fsyncs only, for journal engines) to a background thread (see
+# BackgroundStorage)
+if getenv("STORAGE_DURABILITY", "sync") != "sync":
+    storage = BackgroundStorage(
+        storage,
+        durability=getenv("STORAGE_DURABILITY"),
+        interval=float(getenv("STORAGE_FLUSH_INTERVAL", "1.0")),
+        threshold=int(getenv("STORAGE_FLUSH_THRESHOLD", "100")))
+
+
+def class_lock(s_class: str) -> threading.RLock:
+    """ Writer lock of a class
+
+    save(), remove(), loads and index updates of a class hold its lock;
+    reads never do: they use atomic dict operations and iterate copies.
+    """
+    lock = LOCKS.get(s_class)
+    if lock is None:
+        lock = LOCKS.setdefault(s_class, threading.RLock())
+    return lock
+
+
+def epoch_from_timestamp(timestamp: str) -> int:
+    """ Convert a TIMESTAMP_FORMAT string to an epoch, without strptime
+    """
+    return calendar.timegm((int(timestamp[0:4]), int(timestamp[5:7]),
+                            int(timestamp[8:10]), int(timestamp[11:13]),
+                            int(timestamp[14:16]), int(timestamp[17:19])))
+
+
+class EpochTimestamp():
+    """ Datetime attribute stored as an integer epoch in a slot
+    """
+
+    def __init__(self, slot: str):
+        """ Initialize an EpochTimestamp stored in `slot`
+        """
+        self.slot = slot
+
+    def __get__(self, obj, cls=None) -> datetime:
+        """ Return the timestamp as a naive UTC datetime
+        """
+        if obj is None:
+            return self
+        return datetime.utcfromtimestamp(getattr(obj, self.slot))
+
+    def __set__(self, obj, value: datetime):
+        """ Store a datetime (or an epoch) as an epoch
+        """
+        if type(value) is datetime:
+            value = calendar.timegm(value.utctimetuple())
+        setattr(obj, self.slot, value)
 
 
 class Base():
     """ Base class
+
+    `__fields__` lists the serialized attributes, in order, and
+    `__timestamps__` the ones holding a datetime.
     """
 
+    __indexes__ = ()
+    __fields__ = ('id', 'created_at', 'updated_at')
+    __timestamps__ = ('created_at', 'updated_at')
+    if COMPACT_MODELS:
+        __slots__ = ('id', '_created_at', '_updated_at')
+        created_at = EpochTimestamp('_created_at')
+        updated_at = EpochTimestamp('_updated_at')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+        DATA.setdefault(s_class, {})
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
+        if COMPACT_MODELS:
+            now = int(time.time())
+            created_at = kwargs.get('created_at')
+            self._created_at = now if created_at is None else \
+                epoch_from_timestamp(created_at)
+            updated_at = kwargs.get('updated_at')
+            self._updated_at = now if updated_at is None else \
+                epoch_from_timestamp(updated_at)
+            return
         if kwargs.get('created_at') is not None:
             self.created_at = datetime.strptime(kwargs.get('created_at'),
                                                 TIMESTAMP_FORMAT)
@@ -35,6 +138,90 @@ class Base():
         else:
             self.updated_at = datetime.utcnow()
 
+    def __setattr__(self, name: str, value):
+        """ Set an attribute and keep the secondary indexes up to date
+
+        Only the stored instance is indexed: objects being loaded or not
+        saved yet skip the class lock.
+        """
+        if name not in self.__indexes__:
+            super().__setattr__(name, value)
+            return
+        s_class = self.__class__.__name__
+        objs = DATA.get(s_class, {})
+        if getattr(objs, 'peek', objs.get)(getattr(self, 'id', None)) \
+                is not self:
+            super().__setattr__(name, value)
+            return
+        with class_lock(s_class):
+            indexed = self._unindex_attr(name)
+            super().__setattr__(name, value)
+            if indexed:
+                self._index_attr(name)
+
+    def _index_attr(self, name: str):
+        """ Add the object ID to the index of one attribute
+        """
+        index = INDEXES.setdefault(self.__class__.__name__, {})
+        buckets = index.setdefault(name, {})
+        try:
+            buckets.setdefault(getattr(self, name, None), {})[self.id] = None
+        except TypeError:
+            # Unhashable value: only reachable through a scan
+            pass
+
+    def _unindex_attr(self, name: str) -> bool:
+        """ Remove the object ID from the index of one attribute
+        """
+        s_class = self.__class__.__name__
+        buckets = INDEXES.get(s_class, {}).get(name)
+        if buckets is None:
+            return False
+        try:
+            value = getattr(self, name, None)
+            bucket = buckets.get(value)
+        except TypeError:
+            return False
+        if bucket is None or self.id not in bucket:
+            return False
+        # Another instance with the same ID (being loaded, or a copy) must
+        # not touch the entry of the stored object
+        objs = DATA.get(s_class, {})
+        if getattr(objs, 'peek', objs.get)(self.id) is not self:
+            return False
+        del bucket[self.id]
+        if len(bucket) == 0:
+            del buckets[value]
+        return True
+
+    @classmethod
+    def _unindex_values(cls, obj_id: str, values: dict):
+        """ Remove an ID from the indexes, given its indexed values
+        """
+        index = INDEXES.get(cls.__name__, {})
+        for name, value in values.items():
+            buckets = index.get(name, {})
+            try:
+                bucket = buckets.get(value)
+            except TypeError:
+                continue
+            if bucket is not None:
+                bucket.pop(obj_id, None)
+                if len(bucket) == 0:
+                    del buckets[value]
+
+    def _index(self):
+        """ Add the object to all indexes of its class
+        """
+        for name in self.__indexes__:
+            self._index_attr(name)
+
+    def _unindex(self):
+        """ Remove the object from all indexes of its class
+        """
+        for name in self.__indexes__:
+            self._unindex_attr(name)
+
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
         """
@@ -44,67 +231,129 @@ class Base():
             return False
         return (self.id == other.id)
 
-    def to_json(self, for_serialization: bool = False) -> dict:
+    def to_json(self, for_serialization: bool = False,
+                fields: Iterable[str] = None) -> dict:
         """ Convert the object a JSON dictionary
+
+        `fields` restricts the result to the listed attributes.
         """
-        result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
-                continue
-            if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
-            else:
-                result[key] = value
-        return result
+        return encode(self, for_serialization, fields)
 
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
+
+        DATA and INDEXES of the class are replaced once both are built.
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        with class_lock(s_class):
+            objs = storage.load(cls)
+            index = cls._build_indexes(objs)
+            DATA[s_class] = objs
+            INDEXES[s_class] = index
+
+    @classmethod
+    def _build_indexes(cls, objs: dict) -> dict:
+        """ Build the secondary indexes of loaded objects
+
+        Lazily loaded objects provide their indexed values through
+        `values_of()`, so building the indexes doesn't materialize them.
+        """
+        index = {}
+        for name in cls.__indexes__:
+            buckets = index[name] = {}
+            if hasattr(objs, 'values_of'):
+                pairs = objs.values_of(name)
+            else:
+                pairs = ((obj_id, getattr(obj, name, None))
+                         for obj_id, obj in objs.items())
+            for obj_id, value in pairs:
+                try:
+                    buckets.setdefault(value, {})[obj_id] = None
+                except TypeError:
+                    pass
+        return index
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def _refresh(cls):
+        """ Apply the writes of other processes, with shared storage
+
+        Costs one stat() of the journal when nothing changed.
+        """
+        if not storage.has_changes(cls):
+            return
+        s_class = cls.__name__
+        with class_lock(s_class):
+            records = storage.changes(cls)
+            if records is None:
+                cls.load_from_file()
+                return
+            objs = DATA.setdefault(s_class, {})
+            for record in records:
+                obj_id = record["id"]
+                # Lazily loaded objects are not materialized to be replaced
+                old = getattr(objs, 'peek', objs.get)(obj_id)
+                if old is not None:
+                    old._unindex()
+                elif obj_id in objs:
+                    cls._unindex_values(obj_id, objs.indexed_values(obj_id))
+                objs.pop(obj_id, None)
+                if record["op"] == "upsert":
+                    obj = cls(**record["obj"])
+                    objs[obj.id] = obj
+                    obj._index()
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        with class_lock(s_class):
+            storage.save_all(cls, DATA[s_class])
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def flush(cls):
+        """ Wait until every pending write is on disk
+        """
+        storage.flush()
 
     def save(self):
         """ Save current object
+
+        The lock is released before waiting for the write to be durable,
+        so concurrent writers can share it (see BackgroundStorage).
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with class_lock(s_class):
+            self._refresh()
+            self.updated_at = datetime.utcnow()
+            old = DATA[s_class].get(self.id)
+            if old is not None and old is not self:
+                old._unindex()
+            DATA[s_class][self.id] = self
+            self._index()
+            token = storage.upsert(self.__class__, self, DATA[s_class])
+        storage.wait(token)
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        with class_lock(s_class):
+            self._refresh()
+            obj = DATA[s_class].get(self.id)
+            if obj is None:
+                return
+            obj._unindex()
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            token = storage.delete(self.__class__, self.id, DATA[s_class])
+        storage.wait(token)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
+        cls._refresh()
         s_class = cls.__name__
         return len(DATA[s_class].keys())
 
@@ -118,20 +367,70 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
+        cls._refresh()
         s_class = cls.__name__
         return DATA[s_class].get(id)
 
+    @classmethod
+    def page(cls, limit: int,
+             cursor: str = None) -> Tuple[List[TypeVar('Base')], str]:
+        """ Return up to `limit` objects ordered by ID, after `cursor`
+
+        The second value is the cursor of the next page, None on the last
+        page. The IDs are copied, then only `limit` of them are kept.
+        """
+        cls._refresh()
+        s_class = cls.__name__
+        objs = DATA[s_class]
+        # Iterate a copy: writers may add or remove IDs meanwhile
+        ids = list(objs.keys())
+        if cursor is not None:
+            ids = (obj_id for obj_id in ids if obj_id > cursor)
+        page_ids = heapq.nsmallest(limit + 1, ids)
+        next_cursor = None
+        if len(page_ids) > limit:
+            page_ids = page_ids[:limit]
+            next_cursor = page_ids[-1]
+        page = (objs.get(obj_id) for obj_id in page_ids)
+        return [obj for obj in page if obj is not None], next_cursor
+
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+
+        The first attribute declared in `__indexes__` is resolved through
+        its hash index, the remaining ones are checked on the candidates.
         """
+        cls._refresh()
         s_class = cls.__name__
+        candidates = None
+        remaining = {}
+        for k, v in attributes.items():
+            if candidates is None and k in cls.__indexes__:
+                buckets = INDEXES.get(s_class, {}).get(k, {})
+                try:
+                    ids = list(buckets.get(v, ()))
+                    objs = DATA[s_class]
+                    candidates = [obj for obj in map(objs.get, ids)
+                                  if obj is not None]
+                    continue
+                except TypeError:
+                    pass
+            remaining[k] = v
+        if candidates is None:
+            # Iterate a copy of the IDs: writers may add or remove some
+            # meanwhile. Objects are fetched from DATA itself, so lazily
+            # loaded ones are materialized once and shared with get()
+            objs = DATA[s_class]
+            candidates = (obj for obj in map(objs.get, list(objs.keys()))
+                          if obj is not None)
+
         def _search(obj):
-            if len(attributes) == 0:
+            if len(remaining) == 0:
                 return True
-            for k, v in attributes.items():
+            for k, v in remaining.items():
                 if (getattr(obj, k) != v):
                     return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        return list(filter(_search, candidates))
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+""" BackgroundStorage module
+"""
+from collections import deque
+from typing import Dict, List, Optional, Tuple, TypeVar
+import atexit
+import threading
+import time
+
+
+class BackgroundStorage():
+    """ Storage engine moving snapshot writes off the request thread
+
+    Mutations only mark their class dirty; a writer thread coalesces them
+    into one snapshot write (`save_all` of the wrapped engine). Journal
+    engines (with a `sync()` method) already write each mutation in O(1):
+    their `upsert()`/`delete()` are called as is, and the writer only
+    fsyncs their journal.
+
+    Durability levels:
+      - "group": save()/remove() wait (in `wait()`, once they released
+        their class lock) until the snapshot containing their change is
+        written. The writer starts as soon as the previous write is done:
+        the changes made meanwhile share the next write
+      - "async": save()/remove() return immediately; the writer writes
+        every `interval` seconds, or sooner once `threshold` mutations
+        are pending
+
+    A failed write is retried with the next one. Its error is raised by
+    the `wait()` of the changes it contained and by `flush()`. At exit,
+    the pending writes are flushed for at most `exit_timeout` seconds.
+    """
+
+    DURABILITY_LEVELS = ("group", "async")
+
+    def __init__(self, storage, durability: str = "async",
+                 interval: float = 1.0, threshold: int = 100,
+                 exit_timeout: float = 10.0):
+        """ Initialize a BackgroundStorage and start its writer thread
+        """
+        if durability not in self.DURABILITY_LEVELS:
+            raise ValueError("Unknown durability: {}".format(durability))
+        self.storage = storage
+        self.durability = durability
+        self.interval = interval
+        self.threshold = threshold
+        self.exit_timeout = exit_timeout
+        self.journaled = hasattr(storage, 'sync')
+        self.__dirty = {}
+        self.__pending = 0
+        self.__generation = 0
+        self.__written = 0
+        self.__flushing = False
+        # (after, up to generation, class name, error) of failed writes
+        self.__failures = deque(maxlen=64)
+        self.__cond = threading.Condition()
+        self.__write_lock = threading.Lock()
+        self.__thread = threading.Thread(target=self._run, daemon=True,
+                                         name="storage-writer")
+        self.__thread.start()
+        atexit.register(self._flush_at_exit)
+
+    def file_path(self, cls) -> str:
+        """ Path of the JSON file of a class
+        """
+        return self.storage.file_path(cls)
+
+    def load(self, cls) -> Dict[str, TypeVar('Base')]:
+        """ Load all objects of a class
+        """
+        return self.storage.load(cls)
+
+    def save_all(self, cls, objs: Dict[str, TypeVar('Base')]):
+        """ Write all objects of a class now
+        """
+        with self.__cond:
+            self.__dirty.pop(cls.__name__, None)
+        with self.__write_lock:
+            self.storage.save_all(cls, objs.copy())
+
+    def upsert(self, cls, obj: TypeVar('Base'),
+               objs: Dict[str, TypeVar('Base')]) -> Tuple[int, str]:
+        """ Mark the class of a created or updated object dirty
+        """
+        if self.journaled:
+            self.storage.upsert(cls, obj, objs)
+        return self._mark_dirty(cls, objs)
+
+    def delete(self, cls, obj_id: str,
+               objs: Dict[str, TypeVar('Base')]) -> Tuple[int, str]:
+        """ Mark the class of a removed object dirty
+        """
+        if self.journaled:
+            self.storage.delete(cls, obj_id, objs)
+        return self._mark_dirty(cls, objs)
+
+    def has_changes(self, cls) -> bool:
+        """ Whether other processes wrote objects of a class
+        """
+        return self.storage.has_changes(cls)
+
+    def changes(self, cls) -> Optional[List[dict]]:
+        """ Records written by other processes, None if a reload is needed
+        """
+        return self.storage.changes(cls)
+
+    def wait(self, token: Tuple[int, str]):
+        """ Wait until the snapshot containing a change is written
+
+        `token` is the (generation, class name) returned by upsert() or
+        delete(); only the "group" durability waits. Raises the error of
+        the write, if it failed.
+        """
+        if self.durability != "group" or token is None:
+            return
+        generation, s_class = token
+        with self.__cond:
+            while self.__written < generation:
+                self.__cond.wait()
+            for after, up_to, failed_class, error in self.__failures:
+                if after < generation <= up_to and failed_class == s_class:
+                    raise error
+
+    def flush(self, timeout: float = None):
+        """ Write every dirty class and wait for the write to complete
+
+        Raises the error of a write which failed meanwhile, TimeoutError
+        if the writes take more than `timeout` seconds.
+        """
+        with self.__cond:
+            start = self.__written
+            if self.__dirty and self.__written == self.__generation:
+                # Nothing new but failed writes to retry: one more round
+                self.__generation += 1
+            generation = self.__generation
+            self.__flushing = True
+            self.__cond.notify_all()
+            if not self.__cond.wait_for(
+                    lambda: self.__written >= generation, timeout):
+                raise TimeoutError("Storage writes still pending after "
+                                   "{}s".format(timeout))
+            for after, up_to, _, error in self.__failures:
+                if up_to > start:
+                    raise error
+
+    def _flush_at_exit(self):
+        """ Flush at exit, without keeping the process alive forever
+        """
+        self.flush(self.exit_timeout)
+
+    def _mark_dirty(self, cls,
+                    objs: Dict[str, TypeVar('Base')]) -> Tuple[int, str]:
+        """ Record a mutation and return its (generation, class name)
+        """
+        with self.__cond:
+            self.__dirty[cls.__name__] = (cls, objs)
+            self.__pending += 1
+            self.__generation += 1
+            generation = self.__generation
+            if self.__pending == 1 or self.__pending >= self.threshold:
+                # Wake the writer up: first change to write, or enough of them
+                self.__cond.notify_all()
+            return generation, cls.__name__
+
+    def _run(self):
+        """ Writer thread: write a snapshot (or fsync the journal) of each
+        dirty class
+        """
+        while True:
+            with self.__cond:
+                while self.__written == self.__generation:
+                    self.__cond.wait()
+                deadline = time.monotonic() + self.interval
+                while self.durability == "async" and \
+                        not self.__flushing and \
+                        self.__pending < self.threshold:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__cond.wait(remaining)
+                dirty = self.__dirty
+                self.__dirty = {}
+                self.__pending = 0
+                self.__flushing = False
+                written = self.__written
+                generation = self.__generation
+
+            failed = {}
+            for s_class, (cls, objs) in dirty.items():
+                try:
+                    if self.journaled:
+                        self.storage.sync(cls)
+                        continue
+                    # Copy-on-write: the snapshot is a shallow copy taken
+                    # atomically, request threads keep mutating the original
+                    with self.__write_lock:
+                        self.storage.save_all(cls, objs.copy())
+                except Exception as e:
+                    failed[s_class] = (cls, objs, e)
+
+            with self.__cond:
+                for s_class, (cls, objs, error) in failed.items():
+                    # Retried with the next write of any class
+                    self.__dirty.setdefault(s_class, (cls, objs))
+                    self.__failures.append(
+                        (written, generation, s_class, error))
+                self.__written = generation
+                self.__cond.notify_all()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+""" ShardedStorage module
+"""
+from collections.abc import MutableMapping
+from os import path, getenv
+from typing import Dict, Iterator, Tuple, TypeVar
+import json
+import os
+import shutil
+import threading
+import zlib
+
+from models.engine.journal_storage import JournalStorage
+
+
+class Shards():
+    """ Open file descriptors of the shard files of one snapshot
+
+    Descriptors stay valid after a compaction replaced (and removed) the
+    files, and are closed once no loaded objects refer to them anymore.
+    """
+
+    def __init__(self, dir_path: str, count: int):
+        """ Open the shard files of a snapshot directory
+        """
+        self.fds = [os.open(path.join(dir_path, Shards.name(i)), os.O_RDONLY)
+                    for i in range(count)]
+
+    @staticmethod
+    def name(shard: int) -> str:
+        """ File name of a shard
+        """
+        return "shard_{:03d}.jsonl".format(shard)
+
+    def read(self, shard: int, offset: int, length: int) -> str:
+        """ Read one record, safe to call from several threads
+        """
+        return os.pread(self.fds[shard], length, offset).decode('utf-8')
+
+    def __del__(self):
+        """ Close the shard files
+        """
+        for fd in getattr(self, 'fds', []):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class LazyObjects(MutableMapping):
+    """ Objects of a class, materialized from their shard on first access
+
+    Entries are either an object or a `(shard, offset, length, values)`
+    reference, `values` holding the indexed attributes of the record.
+    """
+
+    def __init__(self, cls, shards: Shards, entries: dict):
+        """ Initialize a LazyObjects mapping
+        """
+        self.cls = cls
+        self.shards = shards
+        self.entries = entries
+        self.lock = threading.RLock()
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return an object, materializing it on first access
+
+        The object is built without the lock (its constructor may wait for
+        the class lock), then published unless another thread was first.
+        """
+        entry = self.entries[obj_id]
+        if type(entry) is not tuple:
+            return entry
+        obj = self.cls(**json.loads(self.shards.read(*entry[:3])))
+        with self.lock:
+            current = self.entries.get(obj_id)
+            if current is entry:
+                self.entries[obj_id] = obj
+            elif current is not None and type(current) is not tuple:
+                obj = current
+        return obj
+
+    def __setitem__(self, obj_id: str, obj: TypeVar('Base')):
+        """ Store an object
+        """
+        self.entries[obj_id] = obj
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an object
+        """
+        del self.entries[obj_id]
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Check an ID without materializing its object
+        """
+        return obj_id in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over a copy of the IDs, taken atomically
+        """
+        return iter(list(self.entries))
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self.entries)
+
+    def get(self, obj_id: str, default=None) -> TypeVar('Base'):
+        """ Return an object or `default`
+        """
+        try:
+            return self[obj_id]
+        except KeyError:
+            return default
+
+    def peek(self, obj_id: str) -> TypeVar('Base'):
+        """ Return an object only if it is already materialized
+        """
+        entry = self.entries.get(obj_id)
+        return None if type(entry) is tuple else entry
+
+    def indexed_values(self, obj_id: str) -> dict:
+        """ Values of the indexed attributes of an object, without
+        materializing it
+        """
+        entry = self.entries[obj_id]
+        if type(entry) is tuple:
+            return entry[3]
+        return _indexed_values(entry)
+
+    def copy(self) -> 'LazyObjects':
+        """ Shallow copy, still sharing the shard files
+        """
+        return LazyObjects(self.cls, self.shards, dict(self.entries))
+
+    def values_of(self, name: str) -> Iterator[Tuple[str, object]]:
+        """ Yield (ID, value) of an indexed attribute, without materializing
+        """
+        for obj_id, entry in list(self.entries.items()):
+            if type(entry) is tuple:
+                yield obj_id, entry[3].get(name)
+            else:
+                yield obj_id, getattr(entry, name, None)
+
+    def records(self) -> Iterator[Tuple[str, str, dict]]:
+        """ Yield (ID, JSON text, indexed values) of every object
+
+        Objects never accessed are copied from their shard as is.
+        """
+        for obj_id, entry in list(self.entries.items()):
+            if type(entry) is tuple:
+                yield obj_id, self.shards.read(*entry[:3]), entry[3]
+            else:
+                yield obj_id, json.dumps(entry.to_json(True)), \
+                    _indexed_values(entry)
+
+
+def _indexed_values(obj: TypeVar('Base')) -> dict:
+    """ Values of the indexed attributes of an object
+    """
+    return {name: getattr(obj, name, None) for name in obj.__indexes__}
+
+
+class ShardedStorage(JournalStorage):
+    """ Journal storage whose snapshot is loaded lazily
+
+    The snapshot is a `.db_<Class>.shards` directory: `shard_NNN.jsonl`
+    files holding one JSON record per line, and `index.json` mapping each
+    ID to its shard, offset and length (plus its indexed attributes).
+    Loading only reads the index; an object is parsed and instantiated
+    the first time it is accessed. Writes go to the journal, as with
+    JournalStorage.
+    """
+
+    def __init__(self, compact_every: int = None, shards: int = None,
+                 shared: bool = None):
+        """ Initialize a ShardedStorage instance
+        """
+        super().__init__(compact_every, shared)
+        if shards is None:
+            shards = int(getenv("STORAGE_SHARDS", "16"))
+        self.shards = shards
+
+    def shards_path(self, cls) -> str:
+        """ Path of the snapshot directory of a class
+        """
+        return ".db_{}.shards".format(cls.__name__)
+
+    def _load_snapshot(self, cls) -> Dict[str, TypeVar('Base')]:
+        """ Read the index of the snapshot, or the JSON snapshot if none
+        """
+        dir_path = self.shards_path(cls)
+        if not path.exists(dir_path) and path.exists(dir_path + ".old"):
+            # Crash in the middle of a swap: the previous snapshot is valid
+            os.rename(dir_path + ".old", dir_path)
+        if not path.exists(path.join(dir_path, "index.json")):
+            return super()._load_snapshot(cls)
+
+        with open(path.join(dir_path, "index.json"), 'r') as f:
+            index = json.load(f)
+        entries = {obj_id: tuple(ref)
+                   for obj_id, ref in index["records"].items()}
+        return LazyObjects(cls, Shards(dir_path, index["shards"]), entries)
+
+    def _write_snapshot(self, cls, objs: Dict[str, TypeVar('Base')]):
+        """ Write the shards and the index, then swap the directories
+        """
+        dir_path = self.shards_path(cls)
+        tmp_path = dir_path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.mkdir(tmp_path)
+
+        if isinstance(objs, LazyObjects):
+            records = objs.records()
+        else:
+            records = ((obj_id, json.dumps(obj.to_json(True)),
+                        _indexed_values(obj))
+                       for obj_id, obj in list(objs.items()))
+
+        files = [open(path.join(tmp_path, Shards.name(i)), 'wb')
+                 for i in range(self.shards)]
+        index = {}
+        try:
+            for obj_id, text, values in records:
+                shard = zlib.crc32(obj_id.encode('utf-8')) % self.shards
+                data = text.encode('utf-8')
+                offset = files[shard].tell()
+                files[shard].write(data + b"\n")
+                index[obj_id] = [shard, offset, len(data), values]
+        finally:
+            for f in files:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+
+        with open(path.join(tmp_path, "index.json"), 'w') as f:
+            json.dump({"shards": self.shards, "records": index}, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if path.exists(dir_path):
+            shutil.rmtree(dir_path + ".old", ignore_errors=True)
+            os.rename(dir_path, dir_path + ".old")
+        os.rename(tmp_path, dir_path)
+        shutil.rmtree(dir_path + ".old", ignore_errors=True)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+""" SharedJournal module
+"""
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+import fcntl
+import json
+import os
+
+
+class SharedJournal():
+    """ Journal file of a class shared by several processes
+
+    Appends and compactions hold an exclusive fcntl lock on a lock file,
+    loads a shared one. Each process keeps the offset it has read up to
+    and picks up the records other processes appended (`catch_up()`).
+
+    A compaction replaces the journal with a new file starting with a
+    `{"op": "generation"}` record. A process seeing the journal change
+    (other inode) drains the old file, and continues with the new one if
+    it is the next generation, or needs a full reload otherwise.
+    """
+
+    def __init__(self, journal_path: str, lock_path: str):
+        """ Initialize a SharedJournal instance
+        """
+        self.path = journal_path
+        self.lock_path = lock_path
+        self.lock_fd = None
+        self.lock_pid = None
+        self.fd = None
+        self.ino = None
+        self.offset = 0
+        self.generation = -1
+        self.signature = None
+        self.records = 0
+        self.pending = []
+        self.own = {}
+        self.reload = False
+
+    @contextmanager
+    def locked(self, operation: int = fcntl.LOCK_EX):
+        """ Hold the lock file, exclusively or shared (fcntl.LOCK_SH)
+        """
+        if self.lock_pid != os.getpid():
+            # flock is held by the open file: a forked worker needs its own
+            self.lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT,
+                                   0o644)
+            self.lock_pid = os.getpid()
+        fcntl.flock(self.lock_fd, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+
+    def reset(self) -> List[dict]:
+        """ Open the current journal and return all its records
+
+        Called by a full load, with the lock held (shared).
+        """
+        self._close()
+        self.pending = []
+        self.own = {}
+        self.reload = False
+        self.generation = -1
+        self.records = 0
+        if os.path.exists(self.path):
+            self._open()
+            self._read()
+        records = [record for _, record in self.pending]
+        self.pending = []
+        return records
+
+    def has_changes(self) -> bool:
+        """ Whether catch_up() would find something: one stat() call
+        """
+        if self.pending or self.reload:
+            return True
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self.ino is not None
+        return (st.st_ino, st.st_size, st.st_mtime_ns) != self.signature
+
+    def catch_up(self) -> bool:
+        """ Read the records appended since the last call
+
+        Return False when the journal can't be followed anymore and the
+        objects must be reloaded.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self.fd is None
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if st.st_ino != self.ino:
+            generation = self.generation
+            if self.fd is not None:
+                # Compacted: the rest of the old file is still to apply
+                self._read()
+            self._close()
+            self._open()
+            if self.generation != generation + 1:
+                return False
+        elif st.st_size < self.offset:
+            return False
+        self._read()
+        self.signature = signature
+        return True
+
+    def changes(self) -> Optional[List[dict]]:
+        """ Records to apply to the loaded objects, None to reload them
+
+        Records of other processes which precede an append of this process
+        for the same ID are dropped: this process already has a newer state.
+        """
+        if self.reload or not self.catch_up():
+            self.reload = True
+            return None
+        records = [record for position, record in self.pending
+                   if self.own.get(record.get("id"), position) <= position]
+        self.pending = []
+        self.own = {}
+        return records
+
+    def append(self, record: dict):
+        """ Append one record, with the exclusive lock held
+        """
+        if not self.catch_up():
+            self.reload = True
+        if self.fd is None:
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT,
+                         0o644)
+            self.fd = fd
+            self.ino = os.fstat(fd).st_ino
+            self.generation = 0
+            self.offset = 0
+        self._cut_torn_tail()
+        data = (json.dumps(record) + "\n").encode('utf-8')
+        self.own[record["id"]] = (self.generation, self.offset)
+        os.write(self.fd, data)
+        self.offset += len(data)
+        self.records += 1
+        st = os.fstat(self.fd)
+        self.signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def replace(self):
+        """ Start the next generation of the journal, once compacted
+
+        With the exclusive lock held, after catch_up().
+        """
+        generation = self.generation + 1
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({"op": "generation",
+                                "generation": generation}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._close()
+        self._open()
+        self.records = 0
+        st = os.fstat(self.fd)
+        self.signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _cut_torn_tail(self):
+        """ Cut off a record torn by a crash, with the exclusive lock held
+
+        No append is in progress: a journal not ending with "\n" ends with
+        a torn record, which the next appends would be glued onto.
+        """
+        size = os.fstat(self.fd).st_size
+        if size == 0 or os.pread(self.fd, 1, size - 1) == b"\n":
+            return
+        start = max(self.offset, size - (1 << 16))
+        while True:
+            data = os.pread(self.fd, size - start, start)
+            end = data.rfind(b"\n")
+            if end >= 0 or start == self.offset:
+                break
+            start = max(self.offset, start - (1 << 16))
+        os.ftruncate(self.fd, start + end + 1)
+
+    def _open(self):
+        """ Open the journal file and read its generation
+        """
+        self.fd = os.open(self.path, os.O_RDWR | os.O_APPEND)
+        self.ino = os.fstat(self.fd).st_ino
+        self.generation, self.offset = self._header()
+
+    def _close(self):
+        """ Close the journal file
+        """
+        if self.fd is not None:
+            os.close(self.fd)
+        self.fd = None
+        self.ino = None
+
+    def _header(self) -> Tuple[int, int]:
+        """ Generation and length of the first record, (0, 0) if absent
+        """
+        line = os.pread(self.fd, 4096, 0).split(b"\n", 1)[0]
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return 0, 0
+        if record.get("op") != "generation":
+            return 0, 0
+        return record["generation"], len(line) + 1
+
+    def _read(self):
+        """ Read the complete records after the offset into `pending`
+        """
+        chunks = []
+        offset = self.offset
+        while True:
+            chunk = os.pread(self.fd, 1 << 16, offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+        data = b"".join(chunks)
+        # A record being appended right now has no "\n" yet
+        end = data.rfind(b"\n") + 1
+        position = self.offset
+        for line in data[:end].split(b"\n")[:-1]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {}
+            if record.get("op") in ("upsert", "delete"):
+                self.pending.append(((self.generation, position), record))
+                self.records += 1
+            position += len(line) + 1
+        self.offset += end
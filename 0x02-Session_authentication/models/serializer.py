@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+""" Serializer module
+
+Turns model objects into JSON dictionaries through per-class encoders,
+and dictionaries into JSON bytes through the fastest available backend.
+"""
+from datetime import datetime
+from functools import lru_cache
+from os import getenv
+from typing import Callable, Iterable, List, Tuple, TypeVar
+import json
+import time
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+@lru_cache(maxsize=65536)
+def format_datetime(value: datetime) -> str:
+    """ Format a datetime, cached by value
+    """
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+@lru_cache(maxsize=65536)
+def format_epoch(value: int) -> str:
+    """ Format an epoch, cached by value
+    """
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(value))
+
+
+def format_timestamp(value) -> str:
+    """ Format a timestamp attribute, other values are kept as is
+    """
+    if type(value) is datetime:
+        return format_datetime(value)
+    return value
+
+
+@lru_cache(maxsize=1024)
+def field_encoders(cls, fields: Tuple[str] = None,
+                   for_serialization: bool = False
+                   ) -> Tuple[Tuple[str, str, Callable]]:
+    """ Compile the (key, attribute, formatter) encoders of a class
+
+    Timestamps are read from their epoch slot when the class stores them
+    that way (see EpochTimestamp), so no datetime is built to format them.
+    """
+    declared = cls.__fields__
+    encoders = []
+    for name in declared if fields is None else fields:
+        if not for_serialization and name[0] == '_':
+            continue
+        if fields is not None and name not in declared:
+            continue
+        slot = getattr(getattr(cls, name, None), 'slot', None)
+        if slot is not None:
+            encoders.append((name, slot, format_epoch))
+        elif name in cls.__timestamps__:
+            encoders.append((name, name, format_timestamp))
+        else:
+            encoders.append((name, name, None))
+    return tuple(encoders)
+
+
+def encode(obj: TypeVar('Base'), for_serialization: bool = False,
+           fields: Iterable[str] = None) -> dict:
+    """ Convert an object to a JSON dictionary
+
+    Objects of the dict layout are converted from their `__dict__`, with
+    the attributes set on them besides the declared `__fields__`.
+    """
+    attributes = getattr(obj, '__dict__', None)
+    if fields is None and attributes is not None:
+        result = {}
+        # Copied atomically: background snapshots encode objects which
+        # request threads may be setting attributes on
+        for key, value in list(attributes.items()):
+            if not for_serialization and key[0] == '_':
+                continue
+            if type(value) is datetime:
+                value = format_datetime(value)
+            result[key] = value
+        return result
+    if fields is not None and type(fields) is not tuple:
+        fields = tuple(fields)
+    result = {}
+    for key, attr, formatter in field_encoders(obj.__class__, fields,
+                                               for_serialization):
+        value = getattr(obj, attr, None)
+        if formatter is not None and value is not None:
+            value = formatter(value)
+        result[key] = value
+    return result
+
+
+def encode_many(objs: Iterable[TypeVar('Base')],
+                fields: Iterable[str] = None) -> List[dict]:
+    """ Convert objects to JSON dictionaries
+    """
+    return [encode(obj, fields=fields) for obj in objs]
+
+
+def _json_backend() -> Tuple[str, Callable]:
+    """ Select the JSON backend: JSON_BACKEND, or the fastest installed
+
+    Falls back to the standard library when the requested backend (or
+    none of them) is installed.
+    """
+    requested = getenv("JSON_BACKEND", "auto")
+    if requested in ("auto", "orjson"):
+        try:
+            import orjson
+            return "orjson", orjson.dumps
+        except ImportError:
+            pass
+    if requested in ("auto", "ujson"):
+        try:
+            import ujson
+            return "ujson", lambda data: ujson.dumps(
+                data, ensure_ascii=False,
+                escape_forward_slashes=False).encode('utf-8')
+        except ImportError:
+            pass
+    return "json", lambda data: json.dumps(data).encode('utf-8')
+
+
+JSON_BACKEND, dumps = _json_backend()
@@ -2,13 +2,19 @@
 """ User module
 """
 import hashlib
-from models.base import Base
+from models.base import Base, COMPACT_MODELS
 
 
 class User(Base):
     """ User class
     """
 
+    __indexes__ = ('email',)
+    __fields__ = Base.__fields__ + \
+        ('email', '_password', 'first_name', 'last_name')
+    if COMPACT_MODELS:
+        __slots__ = ('email', '_password', 'first_name', 'last_name')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """Flask app for user registration."""
-from flask import Flask, request, jsonify
-from auth import Auth
+import json
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+from auth import Auth, BULK_MESSAGES, parse_bulk_row
 
 # Instantiate the Auth object
 AUTH = Auth()
@@ -9,6 +11,11 @@ AUTH = Auth()
 # Create an instance of the Flask class
 app = Flask(__name__)
 
+@app.teardown_appcontext
+def close_db_session(exception=None):
+    """Give the request's database session back at the end of a request."""
+    AUTH._db.close_session()
+
 @app.route("/", methods=["GET"])
 def welcome():
     """Root endpoint that returns a welcome message."""
@@ -37,6 +44,32 @@ def users():
         # If the user is already registered, return an error message
         return jsonify({"message": "email already registered"}), 400
 
+@app.route("/users/bulk", methods=["POST"])
+def users_bulk():
+    """
+    Register users in bulk.
+
+    Expects newline-delimited JSON objects with 'email' and 'password',
+    read as they arrive.
+
+    Returns:
+        Response: Newline-delimited JSON, one {"email", "message"} object
+        per input row in the same order, streamed batch by batch.
+    """
+    def rows():
+        for line in request.stream:
+            row = parse_bulk_row(line)
+            if row is not None:
+                yield row
+
+    def results():
+        for email, status in AUTH.register_users(rows()):
+            yield json.dumps({"email": email,
+                              "message": BULK_MESSAGES[status]}) + "\n"
+
+    return Response(stream_with_context(results()),
+                    mimetype="application/x-ndjson")
+
 # Run the Flask app
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
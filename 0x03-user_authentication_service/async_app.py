@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Async (ASGI) variant of the Flask app, with the same routes.
+
+Served by Quart, e.g. `hypercorn async_app:app`. bcrypt and the
+database run in bounded thread pools (see AsyncAuth and AsyncDB), so a
+process keeps serving while thousands of slow requests are open.
+"""
+import json
+
+from quart import Quart, Response, request, jsonify
+from async_auth import AsyncAuth
+from auth import BULK_MESSAGES, parse_bulk_row
+
+# Instantiate the AsyncAuth object
+AUTH = AsyncAuth()
+
+# Create an instance of the Quart class
+app = Quart(__name__)
+
+@app.route("/", methods=["GET"])
+async def welcome():
+    """Root endpoint that returns a welcome message."""
+    return jsonify({"message": "Bienvenue"})
+
+@app.route("/users", methods=["POST"])
+async def users():
+    """
+    Register a new user.
+
+    Expects 'email' and 'password' form data.
+
+    Returns:
+        Response: JSON payload with user registration status.
+    """
+    form = await request.form
+    email = form.get("email")
+    password = form.get("password")
+
+    try:
+        user = await AUTH.register_user(email, password)
+        return jsonify({"email": user.email, "message": "user created"}), 200
+    except ValueError:
+        return jsonify({"message": "email already registered"}), 400
+
+@app.route("/users/bulk", methods=["POST"])
+async def users_bulk():
+    """
+    Register users in bulk, see the Flask app.
+
+    Returns:
+        Response: Newline-delimited JSON, one {"email", "message"} object
+        per input row in the same order, streamed batch by batch.
+    """
+    body = request.body
+
+    async def lines():
+        rest = b""
+        async for chunk in body:
+            rest += chunk
+            *complete, rest = rest.split(b"\n")
+            for line in complete:
+                yield line
+        yield rest
+
+    async def rows():
+        async for line in lines():
+            row = parse_bulk_row(line)
+            if row is not None:
+                yield row
+
+    async def results():
+        async for email, status in AUTH.register_users(rows()):
+            yield (json.dumps({"email": email,
+                               "message": BULK_MESSAGES[status]}) + "\n"
+                   ).encode("utf-8")
+
+    return Response(results(), mimetype="application/x-ndjson")
+
+# Run the Quart app
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000)
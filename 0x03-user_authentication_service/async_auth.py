@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Async auth module: Auth for the async app."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterable, AsyncIterator, List, Set, Tuple
+
+from async_db import AsyncDB
+from auth import BulkBatch
+from user import User
+from password_policy import PasswordPolicy
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import NoResultFound
+
+
+class AsyncAuth:
+    """Auth with coroutines, which never block the event loop.
+
+    bcrypt runs in a pool of BCRYPT_WORKERS threads (the number of CPUs
+    by default): it releases the GIL, so they hash in parallel, and the
+    requests beyond that wait in the pool queue without holding a worker.
+    The database is reached through AsyncDB.
+    """
+
+    def __init__(self, db: AsyncDB = None, workers: int = None):
+        """
+        Initialize a new AsyncAuth instance.
+
+        Args:
+            db (AsyncDB): The database, a new AsyncDB() by default.
+            workers (int): The number of bcrypt threads, BCRYPT_WORKERS or
+                the number of CPUs by default.
+        """
+        self._db = db if db is not None else AsyncDB()
+        self._policy = PasswordPolicy.from_env()
+        if workers is None:
+            workers = int(os.getenv("BCRYPT_WORKERS", "0")) or os.cpu_count()
+        self._hashing = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix="bcrypt")
+
+    async def _bcrypt(self, function, *args):
+        """Runs a PasswordPolicy method in the bcrypt pool."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._hashing, function, *args)
+
+    async def _hash_password(self, password: str) -> bytes:
+        """Hashes a password using bcrypt with the policy cost factor."""
+        return await self._bcrypt(self._policy.hash, password)
+
+    async def register_user(self, email: str, password: str) -> User:
+        """Registers a new user if they don't exist, see Auth."""
+        try:
+            await self._db.find_user_by(email=email)
+            raise ValueError(f"User {email} already exists")
+        except NoResultFound:
+            hashed_password = await self._hash_password(password)
+            try:
+                return await self._db.add_user(email, hashed_password)
+            except IntegrityError:
+                # Registered by a concurrent request meanwhile
+                raise ValueError(f"User {email} already exists")
+
+    async def register_users(self, users: AsyncIterable[Tuple[str, str]],
+                             batch_size: int = 500
+                             ) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Registers many users, yielding the result of each one in order.
+
+        Args:
+            users (AsyncIterable[Tuple[str, str]]): (email, password) pairs.
+            batch_size (int): The number of users per batch.
+
+        Yields:
+            Tuple[str, str]: The email and its status, see
+            Auth.register_users.
+        """
+        seen = set()
+        batch = []
+        async for email, password in users:
+            batch.append((email, password))
+            if len(batch) >= batch_size:
+                for result in await self._register_batch(batch, seen):
+                    yield result
+                batch = []
+        if batch:
+            for result in await self._register_batch(batch, seen):
+                yield result
+
+    async def _register_batch(self, batch: List[Tuple[str, str]],
+                              seen: Set[str]) -> List[Tuple[str, str]]:
+        """Registers one batch of register_users, see Auth."""
+        bulk = BulkBatch(batch, seen)
+        existing = await self._db.find_existing_emails(bulk.new_emails())
+        hashed = await asyncio.gather(
+            *map(self._hash_password, bulk.set_existing(existing)))
+        rows = bulk.users(hashed)
+        try:
+            await self._db.add_users(rows)
+            bulk.set_created()
+        except IntegrityError:
+            # Some were registered meanwhile by another request: one by one
+            bulk.set_created([await self._add_user_row(row) for row in rows])
+        return bulk.results()
+
+    async def _add_user_row(self, row: Tuple[str, bytes]) -> bool:
+        """Inserts one user row, False if the email is already taken."""
+        try:
+            await self._db.add_users([row])
+            return True
+        except IntegrityError:
+            return False
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """
+        Validates user login credentials, see Auth.
+
+        Args:
+            email (str): The email of the user.
+            password (str): The password provided for authentication.
+
+        Returns:
+            bool: True if login is successful, False otherwise.
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return False
+        if not await self._bcrypt(self._policy.verify, user.hashed_password,
+                                  password):
+            return False
+        if self._policy.needs_rehash(user.hashed_password):
+            try:
+                # Unless the password was changed meanwhile
+                await self._db.compare_and_set_user(
+                    user.id, {"hashed_password": user.hashed_password},
+                    hashed_password=await self._hash_password(password))
+            except Exception:
+                # The login is valid even if the upgrade can't be stored
+                pass
+        return True
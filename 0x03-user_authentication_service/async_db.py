@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Async DB module: the DB methods as coroutines."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Set, Tuple
+
+from db import DB
+from user import User
+
+
+class AsyncDB:
+    """Runs DB calls in a bounded thread pool, for the async app.
+
+    SQLAlchemy 1.3 has no asyncio support: each call runs in one of
+    DB_ASYNC_WORKERS threads (DB_POOL_SIZE by default, so no thread
+    waits for a connection) and the event loop is free meanwhile. The
+    thread's session is closed after each call; the User objects
+    returned are detached, with their columns loaded.
+    """
+
+    def __init__(self, db: DB = None, workers: int = None) -> None:
+        """
+        Initialize a new AsyncDB instance.
+
+        Args:
+            db (DB): The database, a new DB() by default.
+            workers (int): The number of threads, DB_ASYNC_WORKERS by
+                default.
+
+        Raises:
+            ValueError: If the DB shares one session between threads.
+        """
+        self.db = db if db is not None else DB()
+        if not self.db._scoped:
+            # One session used by several threads at once
+            raise ValueError("AsyncDB needs DB_SESSION=scoped")
+        if workers is None:
+            workers = int(os.getenv("DB_ASYNC_WORKERS", "0")) or \
+                int(os.getenv("DB_POOL_SIZE", "5"))
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="db")
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Run function(db, *args, **kwargs) in the pool.
+
+        For several DB calls within one session (and one thread).
+
+        Returns:
+            The result of the function.
+        """
+        def call():
+            try:
+                return function(self.db, *args, **kwargs)
+            finally:
+                self.db.close_session()
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, call)
+
+    async def add_user(self, email: str, hashed_password: str) -> User:
+        """Coroutine of DB.add_user."""
+        return await self.run(DB.add_user, email, hashed_password)
+
+    async def add_users(self, users: Iterable[Tuple[str, str]],
+                        batch_size: int = 1000) -> int:
+        """Coroutine of DB.add_users."""
+        return await self.run(DB.add_users, list(users), batch_size)
+
+    async def find_existing_emails(self, emails: Iterable[str],
+                                   batch_size: int = 500) -> Set[str]:
+        """Coroutine of DB.find_existing_emails."""
+        return await self.run(DB.find_existing_emails, list(emails),
+                              batch_size)
+
+    async def find_user_by(self, **kwargs) -> User:
+        """Coroutine of DB.find_user_by."""
+        return await self.run(DB.find_user_by, **kwargs)
+
+    async def update_user(self, user_id: int, **kwargs) -> None:
+        """Coroutine of DB.update_user."""
+        await self.run(DB.update_user, user_id, **kwargs)
+
+    async def compare_and_set_user(self, user_id: int, expected: dict,
+                                   **kwargs) -> bool:
+        """Coroutine of DB.compare_and_set_user."""
+        return await self.run(DB.compare_and_set_user, user_id, expected,
+                              **kwargs)
+
+    def close(self) -> None:
+        """Stop the threads, once the pending calls are done."""
+        self._executor.shutdown()
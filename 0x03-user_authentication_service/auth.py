@@ -1,16 +1,122 @@
 #!/usr/bin/env python3
 """Auth module for user authentication and management."""
+import json
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
 from db import DB
 from user import User
-import bcrypt
+from password_policy import PasswordPolicy
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
+# Message of each register_users status, in the /users/bulk responses
+BULK_MESSAGES = {
+    "created": "user created",
+    "exists": "email already registered",
+    "duplicate": "email repeated in this request",
+    "invalid": "email and password required",
+}
+
+
+def parse_bulk_row(line: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Parses one line of a /users/bulk request.
+
+    Args:
+        line (bytes): A JSON object with 'email' and 'password'.
+
+    Returns:
+        Optional[Tuple[str, str]]: The (email, password) pair, (None, None)
+        if the line isn't a JSON object, None if it is blank.
+    """
+    if not line.strip():
+        return None
+    try:
+        row = json.loads(line)
+    except ValueError:
+        row = None
+    if not isinstance(row, dict):
+        row = {}
+    return row.get("email"), row.get("password")
+
+
+class BulkBatch:
+    """
+    One batch of register_users: its rows and their statuses.
+
+    Auth and AsyncAuth only run the database and hashing calls; the
+    classification of the rows and their statuses are kept here.
+    """
+
+    def __init__(self, rows: List[Tuple[str, str]], seen: Set[str]):
+        """
+        Classifies the rows: invalid, duplicate or new.
+
+        Args:
+            rows (List[Tuple[str, str]]): (email, password) pairs.
+            seen (Set[str]): The emails of the previous batches, updated.
+        """
+        self.rows = rows
+        self.statuses = [None] * len(rows)
+        self.new = []
+        self.to_create = []
+        for i, (email, password) in enumerate(rows):
+            if not isinstance(email, str) or not email or \
+                    not isinstance(password, str) or not password:
+                self.statuses[i] = "invalid"
+            elif email in seen:
+                self.statuses[i] = "duplicate"
+            else:
+                seen.add(email)
+                self.new.append(i)
+
+    def new_emails(self) -> List[str]:
+        """Returns the emails to look up in the database."""
+        return [self.rows[i][0] for i in self.new]
+
+    def set_existing(self, existing: Set[str]) -> List[str]:
+        """
+        Marks the new emails already registered.
+
+        Returns:
+            List[str]: The passwords to hash, of the users to create.
+        """
+        for i in self.new:
+            if self.rows[i][0] in existing:
+                self.statuses[i] = "exists"
+            else:
+                self.to_create.append(i)
+        return [self.rows[i][1] for i in self.to_create]
+
+    def users(self, hashed: List[bytes]) -> List[Tuple[str, bytes]]:
+        """Returns the (email, hashed password) rows to insert."""
+        return [(self.rows[i][0], h) for i, h in zip(self.to_create, hashed)]
+
+    def set_created(self, created: List[bool] = None):
+        """
+        Marks the users to create as created.
+
+        Args:
+            created (List[bool]): Whether each one was inserted, when they
+                were inserted one by one; all of them by default.
+        """
+        if created is None:
+            created = [True] * len(self.to_create)
+        for i, ok in zip(self.to_create, created):
+            self.statuses[i] = "created" if ok else "exists"
+
+    def results(self) -> List[Tuple[str, str]]:
+        """Returns the (email, status) of every row, in order."""
+        return [(email, status)
+                for (email, _), status in zip(self.rows, self.statuses)]
+
 
 class Auth:
     """Auth class to interact with the authentication database."""
 
     def __init__(self):
         self._db = DB()
+        self._policy = PasswordPolicy.from_env()
 
     def register_user(self, email: str, password: str) -> User:
         """Registers a new user if they don't exist."""
@@ -20,16 +126,72 @@ class Auth:
         except NoResultFound:
             # If no user is found, register a new one
             hashed_password = self._hash_password(password)
-            user = self._db.add_user(email, hashed_password)
-            return user
+            try:
+                return self._db.add_user(email, hashed_password)
+            except IntegrityError:
+                # Registered by a concurrent request meanwhile
+                raise ValueError(f"User {email} already exists")
+
+    def register_users(self, users: Iterable[Tuple[str, str]],
+                       batch_size: int = 500) -> Iterator[Tuple[str, str]]:
+        """
+        Registers many users, yielding the result of each one in order.
+
+        Each batch costs one query to find the emails already registered,
+        parallel password hashing and one bulk insert.
+
+        Args:
+            users (Iterable[Tuple[str, str]]): (email, password) pairs.
+            batch_size (int): The number of users per batch.
+
+        Yields:
+            Tuple[str, str]: The email and its status: "created", "exists"
+            (already registered), "duplicate" (earlier in `users`) or
+            "invalid" (email or password missing or not a string).
+        """
+        seen = set()
+        batch = []
+        for email, password in users:
+            batch.append((email, password))
+            if len(batch) >= batch_size:
+                yield from self._register_batch(batch, seen)
+                batch = []
+        if batch:
+            yield from self._register_batch(batch, seen)
+
+    def _register_batch(self, batch: List[Tuple[str, str]],
+                        seen: Set[str]) -> List[Tuple[str, str]]:
+        """Registers one batch of register_users, see its statuses."""
+        bulk = BulkBatch(batch, seen)
+        existing = self._db.find_existing_emails(bulk.new_emails())
+        hashed = self._policy.hash_many(bulk.set_existing(existing))
+        rows = bulk.users(hashed)
+        try:
+            self._db.add_users(rows)
+            bulk.set_created()
+        except IntegrityError:
+            # Some were registered meanwhile by another request: one by one
+            bulk.set_created([self._add_user_row(row) for row in rows])
+        return bulk.results()
+
+    def _add_user_row(self, row: Tuple[str, bytes]) -> bool:
+        """Inserts one user row, False if the email is already taken."""
+        try:
+            self._db.add_users([row])
+            return True
+        except IntegrityError:
+            return False
 
     def _hash_password(self, password: str) -> bytes:
-        """Hashes a password using bcrypt."""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        """Hashes a password using bcrypt with the policy cost factor."""
+        return self._policy.hash(password)
 
     def valid_login(self, email: str, password: str) -> bool:
         """
         Validates user login credentials.
+
+        A valid password stored with another cost factor than the policy's
+        is transparently rehashed with the target cost factor.
         
         Args:
             email (str): The email of the user.
@@ -42,10 +204,18 @@ class Auth:
             # Locate the user by email
             user = self._db.find_user_by(email=email)
             # Check if the provided password matches the stored hashed password
-            if bcrypt.checkpw(password.encode('utf-8'), user.hashed_password):
-                return True
-            else:
+            if not self._policy.verify(user.hashed_password, password):
                 return False
+            if self._policy.needs_rehash(user.hashed_password):
+                try:
+                    # Unless the password was changed meanwhile
+                    self._db.compare_and_set_user(
+                        user.id, {"hashed_password": user.hashed_password},
+                        hashed_password=self._hash_password(password))
+                except Exception:
+                    # The login is valid even if the upgrade can't be stored
+                    pass
+            return True
         except NoResultFound:
             # If the user is not found, return False
             return False
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Load benchmark of the Flask app against its async (Quart) variant.
+
+Usage: ./bench_async.py [slow] [clients] [requests]
+
+Each app is started in its own process with an empty sqlite database.
+`slow` connections are opened first, which send a POST /users body one
+byte per second, as slow mobile clients would. Meanwhile `clients`
+concurrent clients each register `requests` users (POST /users), and
+the throughput and latency of those registrations are reported.
+"""
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SERVERS = {
+    "flask": "from app import app; app.run(port={port}, threaded=True)",
+    "quart": "from async_app import app; app.run(port={port})",
+}
+
+
+async def post(port: int, body: bytes, trickle: asyncio.Event = None) -> int:
+    """
+    Send a POST /users form on a new connection.
+
+    Args:
+        port (int): The server port.
+        body (bytes): The form data.
+        trickle (asyncio.Event): Send the body one byte per second until
+            it is set.
+
+    Returns:
+        int: The HTTP status, 0 if the connection failed.
+    """
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /users HTTP/1.1\r\nHost: localhost\r\n"
+                     b"Content-Type: application/x-www-form-urlencoded\r\n"
+                     b"Content-Length: %d\r\nConnection: close\r\n\r\n"
+                     % len(body))
+        sent = 0
+        if trickle is not None:
+            while not trickle.is_set() and sent < len(body) - 1:
+                writer.write(body[sent:sent + 1])
+                await writer.drain()
+                sent += 1
+                try:
+                    await asyncio.wait_for(trickle.wait(), 1)
+                except asyncio.TimeoutError:
+                    pass
+        writer.write(body[sent:])
+        status = await reader.readline()
+        await reader.read()
+        writer.close()
+        return int(status.split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+async def load(port: int, slow: int, clients: int, requests: int) -> dict:
+    """
+    Run the registrations while the slow connections are open.
+
+    Returns:
+        dict: The measures of the registrations.
+    """
+    done = asyncio.Event()
+    slow_tasks = [asyncio.ensure_future(post(
+        port, b"email=slow-%d@hbtn.io&password=pwd" % i, done))
+        for i in range(slow)]
+    # Let the slow connections get accepted first
+    await asyncio.sleep(min(5, 1 + slow / 1000))
+
+    latencies = []
+    errors = 0
+
+    async def client(n: int):
+        nonlocal errors
+        for i in range(requests):
+            start = time.perf_counter()
+            status = await post(
+                port, b"email=c%d-%d@hbtn.io&password=pwd" % (n, i))
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    slow_errors = sum(status != 200 for status in
+                      await asyncio.gather(*slow_tasks))
+
+    latencies.sort()
+    return {
+        "requests/s": len(latencies) / elapsed,
+        "p50 (ms)": latencies[len(latencies) // 2] * 1000,
+        "p99 (ms)": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": errors,
+        "slow errors": slow_errors,
+    }
+
+
+def serve(name: str, port: int) -> subprocess.Popen:
+    """
+    Start an app on an empty database and wait until it answers.
+
+    Returns:
+        subprocess.Popen: The server process.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "{}.db".format(name))
+    env = dict(os.environ, DB_URL="sqlite:///{}".format(path), DB_FRESH="1",
+               PYTHONPATH=ROOT)
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVERS[name].format(port=port)], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = "http://127.0.0.1:{}/".format(port)
+    for _ in range(100):
+        if server.poll() is not None:
+            raise RuntimeError("{} server exited".format(name))
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("{} server didn't start".format(name))
+
+
+if __name__ == "__main__":
+    slow = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    # Cheap hashes: the bench is about waiting, not about bcrypt
+    os.environ.setdefault("BCRYPT_ROUNDS", "8")
+    # One file descriptor per connection, in the client and the server
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    results = {}
+    for port, name in enumerate(SERVERS, 5100):
+        server = serve(name, port)
+        try:
+            results[name] = asyncio.run(load(port, slow, clients, requests))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print("{} slow connections, {} clients x {} registrations".format(
+        slow, clients, requests))
+    measures = list(results["flask"])
+    print("{:>8}".format("app") + "".join(
+        "{:>13}".format(measure) for measure in measures))
+    for name, result in results.items():
+        print("{:>8}".format(name) + "".join(
+            "{:>13.1f}".format(result[measure]) for measure in measures))
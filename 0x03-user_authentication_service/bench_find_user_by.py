@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark of DB.find_user_by latency, before and after the indexes.
+
+Usage: ./bench_find_user_by.py [rows] [lookups]
+
+A sqlite database with the original (unindexed) users table is filled
+with `rows` users, then each lookup column is timed with the same query
+as DB.find_user_by, first on the unindexed table, then through DB once
+DB() migrated it.
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+COLUMNS = ("email", "session_id", "reset_token")
+
+
+def populate(path: str, rows: int) -> None:
+    """
+    Create the original users table and insert `rows` users.
+
+    Args:
+        path (str): The sqlite database file.
+        rows (int): The number of users.
+    """
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER NOT NULL, "
+                       "email VARCHAR(250) NOT NULL, "
+                       "hashed_password VARCHAR(250) NOT NULL, "
+                       "session_id VARCHAR(250), reset_token VARCHAR(250), "
+                       "PRIMARY KEY (id))")
+    connection.executemany(
+        "INSERT INTO users (email, hashed_password, session_id, reset_token)"
+        " VALUES (?, ?, ?, ?)",
+        (("user-{}@hbtn.io".format(i), "$2b$04$hashed", "session-{}".format(i),
+          "token-{}".format(i) if i % 10 == 0 else None)
+         for i in range(rows)))
+    connection.commit()
+    connection.close()
+
+
+def lookups(rows: int, count: int) -> dict:
+    """
+    Pick the values to look up for each column.
+
+    Args:
+        rows (int): The number of users.
+        count (int): The number of lookups per column.
+
+    Returns:
+        dict: Column name to list of values.
+    """
+    picks = [random.randrange(0, rows, 10) for _ in range(count)]
+    return {
+        "email": ["user-{}@hbtn.io".format(i) for i in picks],
+        "session_id": ["session-{}".format(i) for i in picks],
+        "reset_token": ["token-{}".format(i) for i in picks],
+    }
+
+
+def time_lookups(find, values: dict) -> dict:
+    """
+    Average latency of `find(**{column: value})` for each column.
+
+    Args:
+        find: The lookup function.
+        values (dict): Column name to list of values.
+
+    Returns:
+        dict: Column name to average latency in milliseconds.
+    """
+    latencies = {}
+    for column in COLUMNS:
+        start = time.perf_counter()
+        for value in values[column]:
+            find(**{column: value})
+        latencies[column] = \
+            (time.perf_counter() - start) * 1000 / len(values[column])
+    return latencies
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DB_URL"] = "sqlite:///{}".format(path)
+
+    from db import DB, create_db_engine
+    from user import User
+
+    start = time.perf_counter()
+    populate(path, rows)
+    print("{} rows inserted in {:.1f}s".format(
+        rows, time.perf_counter() - start))
+    values = lookups(rows, count)
+
+    session = sessionmaker(bind=create_db_engine(os.environ["DB_URL"]))()
+    before = time_lookups(
+        lambda **kwargs: session.query(User).filter_by(**kwargs).one(),
+        values)
+    session.close()
+
+    start = time.perf_counter()
+    db = DB()
+    print("migration (index build) in {:.1f}s".format(
+        time.perf_counter() - start))
+    after = time_lookups(db.find_user_by, values)
+
+    print("{:>12} {:>15} {:>15}".format("column", "scan (ms)", "index (ms)"))
+    for column in COLUMNS:
+        print("{:>12} {:>15.3f} {:>15.3f}".format(
+            column, before[column], after[column]))
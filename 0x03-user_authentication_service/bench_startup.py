@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: DB() construction time in each startup mode.
+
+Usage: ./bench_startup.py [rows]
+
+Each start runs in a fresh interpreter against a sqlite file holding
+`rows` users, and reports DB.startup_ms:
+  - fresh: DB_FRESH=1, every table dropped and created again
+  - legacy: first start on a database created before versioning, which
+    gets migrated in place
+  - reuse: later starts, the schema version is up to date
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_find_user_by import populate
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+START = "from db import DB; print(DB().startup_ms)"
+
+
+def start(url: str, fresh: bool = False) -> float:
+    """
+    Construct a DB in a new interpreter.
+
+    Args:
+        url (str): The database URL.
+        fresh (bool): Request the fresh-database mode.
+
+    Returns:
+        float: DB.startup_ms.
+    """
+    env = dict(os.environ, DB_URL=url, DB_FRESH="1" if fresh else "0",
+               PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, "-c", START], env=env, check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True)
+    return float(out.stdout)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    path = os.path.join(tempfile.mkdtemp(), "startup.db")
+    url = "sqlite:///{}".format(path)
+
+    populate(path, rows)
+    results = [("legacy", start(url))]
+    results += [("reuse", start(url)) for _ in range(3)]
+    results += [("fresh", start(url, fresh=True))]
+    print("{:>8} {:>14}".format("mode", "startup (ms)"))
+    for mode, startup_ms in results:
+        print("{:>8} {:>14.1f}".format(mode, startup_ms))
@@ -2,40 +2,134 @@
 """DB module
 """
 
-from sqlalchemy import create_engine
+import logging
+import os
+import time
+from typing import Iterable, Set, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import scoped_session, sessionmaker, Session
+from sqlalchemy.exc import InvalidRequestError, IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.pool import QueuePool
+
+from schema import bootstrap
+from user import User
+
+# Columns update_user() may set (not the primary key)
+UPDATABLE_COLUMNS = frozenset(column.name for column in User.__table__.columns
+                              if not column.primary_key)
+
+
+def create_db_engine(url: str) -> Engine:
+    """
+    Create the engine with the pooling settings of the environment.
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW and DB_POOL_PRE_PING configure the
+    connection pool. Sqlite file databases get a pool too, shared by the
+    request threads (DB_SQLITE_CHECK_SAME_THREAD=0 by default), and WAL
+    journaling (DB_SQLITE_WAL=1 by default) so readers don't block the
+    writer.
+
+    Args:
+        url (str): The database URL.
+
+    Returns:
+        Engine: The new engine.
+    """
+    options = {
+        "echo": False,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+    sqlite = url.startswith("sqlite")
+    if sqlite:
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            # One in-memory database per connection: keep the defaults
+            return create_engine(url, echo=False)
+        options["poolclass"] = QueuePool
+        options["connect_args"] = {
+            "check_same_thread":
+                os.getenv("DB_SQLITE_CHECK_SAME_THREAD", "0") == "1",
+        }
+    engine = create_engine(url, **options)
+
+    if sqlite and os.getenv("DB_SQLITE_WAL", "1") == "1":
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            """Enable WAL journaling on each new sqlite connection."""
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA busy_timeout=5000")
+            cursor.close()
+    return engine
 
-from user import Base, User  # Import Base and User models
 
 class DB:
     """DB class to handle database interactions.
+
+    DB_SESSION selects how sessions are shared:
+      - "scoped" (default): one session per thread, so per request, closed
+        by close_session() when the request ends
+      - "shared": one session for the whole process
     """
 
-    def __init__(self) -> None:
-        """Initialize a new DB instance."""
-        # Create a new SQLite engine instance with echo set to False
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        
-        # Drop all tables in case they already exist (start fresh)
-        Base.metadata.drop_all(self._engine)
+    def __init__(self, fresh: bool = None) -> None:
+        """
+        Initialize a new DB instance.
+
+        The existing database is reused: its schema version is checked
+        and it is only migrated when older than the models. The startup
+        time is logged and kept in `startup_ms`.
+
+        Args:
+            fresh (bool): Start from an empty database (for tests),
+                DB_FRESH=1 by default.
+        """
+        start = time.perf_counter()
+        if fresh is None:
+            fresh = os.getenv("DB_FRESH", "0") == "1"
+
+        # Create a new engine instance, sqlite by default
+        self._engine = create_db_engine(os.getenv("DB_URL", "sqlite:///a.db"))
         
-        # Create all tables defined in Base (in this case, the User table)
-        Base.metadata.create_all(self._engine)
+        # Create the missing tables, columns and indexes, keeping the rows
+        steps = bootstrap(self._engine, fresh)
         
-        # Initialize the session to None
+        self._scoped = os.getenv("DB_SESSION", "scoped") == "scoped"
         self.__session = None
+        if self._scoped:
+            self.__session = scoped_session(sessionmaker(bind=self._engine))
+
+        self.startup_ms = (time.perf_counter() - start) * 1000
+        logging.getLogger(__name__).info(
+            "Database ready in %.1f ms: %s", self.startup_ms,
+            ", ".join(steps) or "schema up to date")
 
     @property
     def _session(self) -> Session:
-        """Memoized session object."""
+        """Session of the current thread, or memoized session object."""
+        if self._scoped:
+            return self.__session()
         if self.__session is None:
             DBSession = sessionmaker(bind=self._engine)
             self.__session = DBSession()
         return self.__session
 
+    def close_session(self) -> None:
+        """
+        Close the session of the current thread, at the end of a request.
+
+        Its connection goes back to the pool; the next use of the session
+        in this thread opens a new one. Nothing is done for a shared session.
+        """
+        if self._scoped:
+            self.__session.remove()
+
     def add_user(self, email: str, hashed_password: str) -> User:
         """
         Adds a new user to the database.
@@ -46,6 +140,9 @@ class DB:
 
         Returns:
             User: The newly created User object.
+
+        Raises:
+            IntegrityError: If the email is already registered.
         """
         # Create a new User instance
         new_user = User(email=email, hashed_password=hashed_password)
@@ -54,13 +151,87 @@ class DB:
         self._session.add(new_user)
         
         # Commit the session to save the user to the database
-        self._session.commit()
+        try:
+            self._session.commit()
+        except IntegrityError:
+            # Email registered meanwhile: leave the session usable
+            self._session.rollback()
+            raise
         
         # Refresh the session to update the new user object with the database-generated ID
         self._session.refresh(new_user)
         
         return new_user
 
+    def add_users(self, users: Iterable[Tuple[str, str]],
+                  batch_size: int = 1000) -> int:
+        """
+        Adds many users, with one multi-row INSERT per batch.
+
+        No User object is built nor refreshed. Each batch is committed on
+        its own: when one fails it is rolled back, the previous ones stay.
+
+        Args:
+            users (Iterable[Tuple[str, str]]): (email, hashed_password) pairs.
+            batch_size (int): The number of users per INSERT and commit.
+
+        Returns:
+            int: The number of users added.
+
+        Raises:
+            IntegrityError: If an email of the batch is already registered.
+        """
+        count = 0
+        batch = []
+        for email, hashed_password in users:
+            batch.append({"email": email, "hashed_password": hashed_password})
+            if len(batch) >= batch_size:
+                count += self._insert_users(batch)
+                batch = []
+        if batch:
+            count += self._insert_users(batch)
+        return count
+
+    def _insert_users(self, rows: list) -> int:
+        """
+        Inserts and commits one batch of users (executemany).
+
+        Args:
+            rows (list): The column values of each user.
+
+        Returns:
+            int: The number of users added.
+        """
+        try:
+            self._session.execute(User.__table__.insert(), rows)
+            self._session.commit()
+        except IntegrityError:
+            self._session.rollback()
+            raise
+        return len(rows)
+
+    def find_existing_emails(self, emails: Iterable[str],
+                             batch_size: int = 500) -> Set[str]:
+        """
+        Finds which emails are already registered.
+
+        One `email IN (...)` query per batch, served by the email index.
+
+        Args:
+            emails (Iterable[str]): The emails to check.
+            batch_size (int): The number of emails per query.
+
+        Returns:
+            Set[str]: The emails already registered.
+        """
+        emails = list(emails)
+        existing = set()
+        for i in range(0, len(emails), batch_size):
+            rows = self._session.query(User.email).filter(
+                User.email.in_(emails[i:i + batch_size])).all()
+            existing.update(row[0] for row in rows)
+        return existing
+
     def find_user_by(self, **kwargs) -> User:
         """
         Find a user by arbitrary keyword arguments.
@@ -89,6 +260,8 @@ class DB:
     def update_user(self, user_id: int, **kwargs) -> None:
         """
         Update a user's attributes.
+
+        One `UPDATE users SET ... WHERE id = ?`, without loading the user.
         
         Args:
             user_id (int): The ID of the user to update.
@@ -97,22 +270,78 @@ class DB:
         Raises:
             ValueError: If the user is not found or if invalid attributes are provided.
         """
+        self._check_columns(kwargs)
+        users = User.__table__
+        if not kwargs:
+            if self._session.query(users.c.id).filter(
+                    users.c.id == user_id).first() is None:
+                raise ValueError("User not found.")
+            return
+        if not self._update_where(users.c.id == user_id, kwargs):
+            raise ValueError("User not found.")
+
+    def compare_and_set_user(self, user_id: int, expected: dict,
+                             **kwargs) -> bool:
+        """
+        Update a user's attributes only if others have the expected values.
+
+        The check and the update are one `UPDATE ... WHERE id = ? AND ...`
+        statement, so concurrent requests can't both succeed. For example
+        `compare_and_set_user(1, {"session_id": None}, session_id=sid)`
+        only sets a session if the user has none.
+
+        Args:
+            user_id (int): The ID of the user to update.
+            expected (dict): The current values required, None for NULL.
+            **kwargs: Key-value pairs of the attributes to update.
+
+        Returns:
+            bool: True if the user was updated, False if it doesn't exist
+            or doesn't have the expected values.
+
+        Raises:
+            ValueError: If invalid attributes are provided.
+        """
+        self._check_columns(expected)
+        self._check_columns(kwargs)
+        if not kwargs:
+            raise ValueError("Nothing to update")
+        users = User.__table__
+        condition = users.c.id == user_id
+        for key, value in expected.items():
+            column = users.c[key]
+            condition &= column.is_(None) if value is None else column == value
+        return self._update_where(condition, kwargs)
+
+    @staticmethod
+    def _check_columns(values: dict) -> None:
+        """
+        Validate attribute names against the updatable columns.
+
+        Raises:
+            ValueError: If a name is not an updatable column.
+        """
+        for key in values:
+            if key not in UPDATABLE_COLUMNS:
+                raise ValueError(f"Invalid attribute: {key}")
+
+    def _update_where(self, condition, values: dict) -> bool:
+        """
+        Run and commit one UPDATE of users.
+
+        Args:
+            condition: The WHERE clause.
+            values (dict): The columns to set.
+
+        Returns:
+            bool: True if a row was updated.
+        """
         try:
-            # Find the user by ID
-            user = self.find_user_by(id=user_id)
-            
-            # Update user's attributes
-            for key, value in kwargs.items():
-                if not hasattr(user, key):
-                    raise ValueError(f"Invalid attribute: {key}")
-                setattr(user, key, value)
-            
-            # Commit the changes to the database
+            result = self._session.execute(
+                User.__table__.update().where(condition).values(**values))
+            updated = result.rowcount > 0
             self._session.commit()
-        
-        except NoResultFound:
-            raise ValueError("User not found.")
-        except Exception as e:
+        except Exception:
             self._session.rollback()
-            raise e
-
+            raise
+        return updated
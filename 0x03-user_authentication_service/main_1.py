@@ -9,7 +9,7 @@ from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.orm.exc import NoResultFound
 
 
-my_db = DB()
+my_db = DB(fresh=True)
 
 user = my_db.add_user("test@test.com", "PwdHashed")
 print(user.id)
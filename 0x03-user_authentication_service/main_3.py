@@ -2,6 +2,11 @@
 """
 Main file
 """
+import os
+
+# Start from an empty database on every run
+os.environ["DB_FRESH"] = "1"
+
 from auth import Auth
 
 email = 'me@me.com'
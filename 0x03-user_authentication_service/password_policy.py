@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Password policy module: bcrypt cost factor management."""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
+
+import bcrypt
+
+
+class PasswordPolicy:
+    """Hashes passwords with a target bcrypt cost factor."""
+
+    MIN_ROUNDS = 4
+    MAX_ROUNDS = 16
+
+    def __init__(self, rounds: int = 12):
+        """
+        Initialize the policy.
+
+        Args:
+            rounds (int): The target bcrypt cost factor.
+        """
+        if not self.MIN_ROUNDS <= rounds <= self.MAX_ROUNDS:
+            raise ValueError(f"Invalid bcrypt cost factor: {rounds}")
+        self.rounds = rounds
+
+    @classmethod
+    def from_env(cls) -> "PasswordPolicy":
+        """
+        Build the policy from the environment.
+
+        BCRYPT_ROUNDS sets the cost factor explicitly; otherwise
+        BCRYPT_BUDGET_MS calibrates it against this host. Without either,
+        bcrypt's default cost factor is used.
+        """
+        rounds = os.getenv("BCRYPT_ROUNDS")
+        if rounds is not None:
+            return cls(int(rounds))
+        budget_ms = os.getenv("BCRYPT_BUDGET_MS")
+        if budget_ms is not None:
+            return cls(cls.calibrate(float(budget_ms)))
+        return cls()
+
+    @classmethod
+    def calibrate(cls, budget_ms: float) -> int:
+        """
+        Find the highest cost factor hashing within a latency budget.
+
+        Args:
+            budget_ms (float): The hashing time budget in milliseconds.
+
+        Returns:
+            int: The calibrated cost factor, at least MIN_ROUNDS.
+        """
+        best = cls.MIN_ROUNDS
+        for rounds in range(cls.MIN_ROUNDS, cls.MAX_ROUNDS + 1):
+            start = time.perf_counter()
+            bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+            if (time.perf_counter() - start) * 1000 > budget_ms:
+                # Each extra round doubles the time: no need to go further
+                break
+            best = rounds
+        return best
+
+    def hash(self, password: str) -> bytes:
+        """Hashes a password with the target cost factor."""
+        return bcrypt.hashpw(password.encode('utf-8'),
+                             bcrypt.gensalt(self.rounds))
+
+    def hash_many(self, passwords: List[str],
+                  workers: Optional[int] = None) -> List[bytes]:
+        """
+        Hashes passwords in parallel, in order.
+
+        bcrypt releases the GIL while hashing, so threads use every core.
+
+        Args:
+            passwords (List[str]): The passwords to hash.
+            workers (int): The number of threads, BCRYPT_WORKERS or the
+                number of CPUs by default.
+
+        Returns:
+            List[bytes]: The hash of each password.
+        """
+        if workers is None:
+            workers = int(os.getenv("BCRYPT_WORKERS", "0")) or os.cpu_count()
+        if workers <= 1 or len(passwords) <= 1:
+            return [self.hash(password) for password in passwords]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.hash, passwords))
+
+    def verify(self, hashed_password: Union[bytes, str],
+               password: str) -> bool:
+        """Checks a password against a stored hash."""
+        if isinstance(hashed_password, str):
+            hashed_password = hashed_password.encode('utf-8')
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+    @staticmethod
+    def rounds_of(hashed_password: Union[bytes, str]) -> Optional[int]:
+        """Reads the cost factor of a bcrypt hash ($2b$<cost>$...)."""
+        if isinstance(hashed_password, bytes):
+            hashed_password = hashed_password.decode('utf-8', 'replace')
+        parts = hashed_password.split('$')
+        if len(parts) < 4 or not parts[2].isdigit():
+            return None
+        return int(parts[2])
+
+    def needs_rehash(self, hashed_password: Union[bytes, str]) -> bool:
+        """Checks if a stored hash uses another cost factor."""
+        return self.rounds_of(hashed_password) != self.rounds
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Schema module: in place migration of the database to the models."""
+from typing import List, Optional
+
+from sqlalchemy import Column, Integer, Table, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from user import Base
+
+# Bump whenever the models change, so existing databases get migrated
+SCHEMA_VERSION = 1
+
+schema_version = Table("schema_version", Base.metadata,
+                       Column("version", Integer, nullable=False))
+
+
+def bootstrap(engine: Engine, fresh: bool = False) -> List[str]:
+    """
+    Prepare the database at startup.
+
+    An up to date database only costs one query. An older one (or one
+    created before versioning) is migrated in place, keeping its rows.
+
+    Args:
+        engine (Engine): The engine of the database.
+        fresh (bool): Drop every table and start from an empty database.
+
+    Returns:
+        List[str]: A description of each step applied, empty if none.
+
+    Raises:
+        ValueError: If the database is newer than this code, or can't be
+            migrated (see migrate).
+    """
+    if fresh:
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        _set_version(engine)
+        return ["create fresh schema"]
+
+    version = current_version(engine)
+    if version == SCHEMA_VERSION:
+        return []
+    if version is not None and version > SCHEMA_VERSION:
+        raise ValueError("Database schema version {} is newer than {}"
+                         .format(version, SCHEMA_VERSION))
+    steps = migrate(engine)
+    _set_version(engine)
+    return steps + ["set schema version {}".format(SCHEMA_VERSION)]
+
+
+def current_version(engine: Engine) -> Optional[int]:
+    """
+    Schema version recorded in the database.
+
+    Args:
+        engine (Engine): The engine of the database.
+
+    Returns:
+        Optional[int]: The version, None if the database has none.
+    """
+    try:
+        with engine.connect() as connection:
+            return connection.execute(
+                schema_version.select()).scalar()
+    except DBAPIError:
+        # No schema_version table yet
+        return None
+
+
+def _set_version(engine: Engine) -> None:
+    """
+    Record SCHEMA_VERSION in the database.
+
+    Args:
+        engine (Engine): The engine of the database.
+    """
+    with engine.begin() as connection:
+        connection.execute(schema_version.delete())
+        connection.execute(schema_version.insert().values(
+            version=SCHEMA_VERSION))
+
+
+def migrate(engine: Engine) -> List[str]:
+    """
+    Bring an existing database up to the declared schema, keeping its rows.
+
+    Missing tables are created, missing nullable columns are added and
+    missing indexes are built. Columns and indexes the models don't
+    declare anymore are left alone.
+
+    Args:
+        engine (Engine): The engine of the database to migrate.
+
+    Returns:
+        List[str]: A description of each step applied, empty if none.
+
+    Raises:
+        ValueError: If a unique index can't be built because of duplicate
+            values, or a missing column can't be added (NOT NULL).
+    """
+    steps = []
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            # New table: created along with its indexes
+            table.create(bind=engine)
+            steps.append("create table {}".format(table.name))
+            continue
+
+        columns = set(c["name"] for c in inspector.get_columns(table.name))
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if not column.nullable:
+                raise ValueError("Can't add NOT NULL column {}.{}".format(
+                    table.name, column.name))
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text("ALTER TABLE {} ADD COLUMN {} {}"
+                                        .format(table.name, column.name,
+                                                column_type)))
+            steps.append("add column {}.{}".format(table.name, column.name))
+
+        indexes = set(i["name"] for i in inspector.get_indexes(table.name))
+        for index in table.indexes:
+            if index.name in indexes:
+                continue
+            if index.unique:
+                _check_unique(engine, table.name,
+                              [c.name for c in index.columns])
+            index.create(bind=engine)
+            steps.append("create index {}".format(index.name))
+    return steps
+
+
+def _check_unique(engine: Engine, table: str, columns: List[str]) -> None:
+    """
+    Fail with the duplicate count before building a unique index.
+
+    Args:
+        engine (Engine): The engine of the database.
+        table (str): The table name.
+        columns (List[str]): The indexed columns.
+
+    Raises:
+        ValueError: If some values are duplicated.
+    """
+    names = ", ".join(columns)
+    query = text("SELECT COUNT(*) FROM (SELECT {0} FROM {1} GROUP BY {0} "
+                 "HAVING COUNT(*) > 1) AS duplicates".format(names, table))
+    with engine.connect() as connection:
+        duplicates = connection.execute(query).scalar()
+    if duplicates:
+        raise ValueError("Can't build a unique index on {}({}): {} values "
+                         "are duplicated".format(table, names, duplicates))